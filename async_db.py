@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_READ_POOL_SIZE
+
+# ✅ All writes go through one thread so SQLite never sees two writers fighting
+# for the lock; reads get a small pool of their own.
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_read_executor = ThreadPoolExecutor(max_workers=DB_READ_POOL_SIZE, thread_name_prefix="db-reader")
+
+
+async def run_read(func, *args, **kwargs):
+    """Runs a blocking read query in the reader pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_write(func, *args, **kwargs):
+    """Runs a blocking write on the single writer thread without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_write_executor, functools.partial(func, *args, **kwargs))
+
+
+def reader(func):
+    """Wraps a sync query helper into an awaitable that runs in the reader pool."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_read(func, *args, **kwargs)
+    return wrapper
+
+
+def writer(func):
+    """Wraps a sync write helper into an awaitable that runs on the writer thread."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_write(func, *args, **kwargs)
+    return wrapper
+
+
+def shutdown():
+    """Waits for queued writes to finish and stops the DB threads."""
+    logging.info("🛑 Stopping database executors...")
+    _write_executor.shutdown(wait=True)
+    _read_executor.shutdown(wait=True)
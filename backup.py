@@ -0,0 +1,168 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import GDRIVE_FOLDER_ID, BACKUP_WINDOW, BACKUP_MAX_STALENESS, BACKUP_MODE
+from database import DB_PATH
+
+
+class BackupScheduler:
+    """Coalesces database writes into one Google Drive upload per quiet window.
+
+    Writers only call mark_dirty(); a background thread uploads once no write
+    has happened for `window` seconds, or once the oldest unsaved write is
+    `max_staleness` seconds old, whichever comes first.
+    """
+
+    def __init__(self, db_path, folder_id, window=BACKUP_WINDOW, max_staleness=BACKUP_MAX_STALENESS, mode=BACKUP_MODE):
+        self.db_path = db_path
+        self.folder_id = folder_id
+        self.window = window
+        self.max_staleness = max_staleness
+        self.mode = mode
+
+        self._cond = threading.Condition()
+        self._dirty_since = None  # monotonic time of the oldest write not yet uploaded
+        self._last_write = None
+        self._pending_writes = 0
+        self._retry_after = 0.0  # monotonic time before which a failed upload is not retried
+        self._upload_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        self.uploads = 0
+        self.failures = 0
+        self.last_upload_at = None  # wall clock, for display
+        self.last_upload_seconds = None
+
+    def mark_dirty(self):
+        """Records that the database changed. Cheap and safe to call from any thread."""
+        with self._cond:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_write = now
+            self._pending_writes += 1
+            self._cond.notify()
+
+    def lag(self):
+        """Seconds since the oldest write that is not on Google Drive yet (0 when clean)."""
+        with self._cond:
+            if self._dirty_since is None:
+                return 0.0
+            return time.monotonic() - self._dirty_since
+
+    def status(self):
+        """Returns a snapshot of the scheduler state for monitoring."""
+        with self._cond:
+            pending = self._pending_writes
+        return {
+            "lag_seconds": round(self.lag(), 1),
+            "pending_writes": pending,
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "last_upload_at": self.last_upload_at,
+            "last_upload_seconds": self.last_upload_seconds,
+        }
+
+    def start(self):
+        """Starts the background upload thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-backup", daemon=True)
+        self._thread.start()
+        logging.info(f"🗓 Backup scheduler started (window={self.window}s, max staleness={self.max_staleness}s)")
+
+    def stop(self, flush=True):
+        """Stops the background thread and uploads any unsaved changes."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def _next_deadline(self):
+        deadline = min(self._last_write + self.window, self._dirty_since + self.max_staleness)
+        return max(deadline, self._retry_after)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and (
+                    self._dirty_since is None or time.monotonic() < self._next_deadline()
+                ):
+                    timeout = None if self._dirty_since is None else self._next_deadline() - time.monotonic()
+                    self._cond.wait(timeout)
+                if self._stopping:
+                    return
+
+            self.flush()
+
+    def flush(self):
+        """Uploads the database now if it has unsaved changes. Returns False if the upload failed."""
+        with self._upload_lock:
+            with self._cond:
+                if self._dirty_since is None:
+                    return True
+                dirty_since, pending = self._dirty_since, self._pending_writes
+                # Writes that land while we upload will mark the DB dirty again
+                self._dirty_since, self._pending_writes = None, 0
+
+            logging.info(f"🔄 Backing up database ({pending} writes coalesced)...")
+            started = time.monotonic()
+            ok = self._upload_snapshot()
+
+            if ok:
+                self.uploads += 1
+                self.last_upload_at = time.strftime("%Y-%m-%d %H:%M:%S")
+                self.last_upload_seconds = round(time.monotonic() - started, 2)
+            else:
+                self.failures += 1
+                with self._cond:
+                    # Keep the changes marked as unsaved and back off for one window
+                    self._dirty_since = dirty_since if self._dirty_since is None else min(dirty_since, self._dirty_since)
+                    self._pending_writes += pending
+                    self._retry_after = time.monotonic() + self.window
+            return ok
+
+    def _upload_snapshot(self):
+        """Copies a consistent snapshot of the live DB and ships it to Google Drive.
+
+        In "replica" mode only the pages that changed since the last backup are
+        uploaded; otherwise the whole file replaces the copy on Drive.
+        """
+        from gdrive import upload_db, drive_client  # Import here to avoid circular dependency
+        from replication import PageReplicator
+
+        if not os.path.exists(self.db_path):
+            return True
+
+        snapshot_path = f"{self.db_path}.snapshot"
+        try:
+            src = sqlite3.connect(self.db_path, timeout=10)
+            dst = sqlite3.connect(snapshot_path)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
+            if self.mode == "replica":
+                if not drive_client.service():
+                    return False
+                return PageReplicator(self.db_path, self.folder_id).ship(drive_client, snapshot_path)
+            return upload_db(snapshot_path, self.folder_id, file_name=os.path.basename(self.db_path))
+        except Exception as e:
+            logging.error(f"❌ Failed to back up database: {e}")
+            return False
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+
+backup_scheduler = BackupScheduler(DB_PATH, GDRIVE_FOLDER_ID)
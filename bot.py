@@ -2,25 +2,22 @@ import asyncio
 import logging
 import os
 import json
+import signal
+import time
+from startup import startup  # ✅ First import: its load time marks the start of the boot timings
 from aiohttp import web  # ✅ Web server for Koyeb health check
 from aiogram import Bot, Dispatcher
-from gdrive import download_db, upload_db
-from config import  GDRIVE_FOLDER_ID
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from config import GDRIVE_FOLDER_ID, STARTUP_RESTORE_TIMEOUT, STARTUP_MIGRATE_TIMEOUT
 from database import DB_PATH
-# Download database from Google Drive
-download_db(DB_PATH, GDRIVE_FOLDER_ID)
-
-# ✅ Retrieve Google Drive credentials from environment variables
-google_credentials = os.getenv("GOOGLE_CREDENTIALS")
-if google_credentials:
-    with open("credentials.json", "w") as f:
-        f.write(google_credentials)
-    print("✅ credentials.json file created successfully!")
-else:
-    print("❌ GOOGLE_CREDENTIALS environment variable is missing!")
+from migrate import run_migrations
+import async_db
+from backup import backup_scheduler
+from rendering import render_service
 
 # ✅ Import bot token
-from config import BOT_TOKEN
+from config import BOT_TOKEN, WEBHOOK_URL, TELEGRAM_API_URL
 
 # ✅ Import all handlers
 from handlers import start, profile
@@ -33,14 +30,58 @@ from handlers.admin import router as admin_router
 from handlers.adduser import router as adduser_router
 from handlers.removeuser import router as removeuser_router
 from handlers.list_users import router as list_users_router
+from handlers.import_users import router as import_users_router
+from handlers.analytics import router as analytics_router
 from handlers.orders import router as orders_router
+from middlewares import identity_middleware
+from fsm_storage import fsm_storage
+from webhook import mount_webhook, set_webhook
+from outbox import outbox
+from digest import order_digest
+from handlers.referral_utils import referral_reconciler
+from ledger import ledger_checkpointer
+from database import employee_cache
+from report_cache import report_cache
+import metrics
+
+startup.record("imports", time.monotonic() - startup.started)
 
 # ✅ Configure logging
 logging.basicConfig(level=logging.INFO)
 
 # ✅ Initialize bot and dispatcher
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
+dp = Dispatcher(storage=fsm_storage)  # ✅ Forms survive restarts; idle ones leave memory
+
+# ✅ Resolve the caller (employee row + admin flag) once per update
+dp.update.outer_middleware(metrics.update_metrics)  # ✅ Throughput, latency and errors of every update
+dp.message.outer_middleware(identity_middleware)
+dp.callback_query.outer_middleware(identity_middleware)
+dp.message.middleware(metrics.handler_metrics)  # ✅ Inner middlewares reach the handlers of every included router
+dp.callback_query.middleware(metrics.handler_metrics)
+
+# ✅ Component stats exported on /metrics
+for component, stats in (
+    ("fsm", fsm_storage.stats), ("outbox", outbox.stats), ("order_digest", order_digest.stats),
+    ("render", render_service.stats), ("backup", backup_scheduler.status),
+    ("employee_cache", employee_cache.stats), ("report_cache", report_cache.stats),
+):
+    metrics.registry.register(metrics.StatsGauges(component, stats))
+
+# ✅ Order digest runs with the dispatcher; on shutdown it flushes first, then the outbox drains
+dp.startup.register(order_digest.start)
+dp.shutdown.register(order_digest.close)
+dp.shutdown.register(outbox.close)
+
+# ✅ Background maintenance jobs
+dp.startup.register(referral_reconciler.start)
+dp.shutdown.register(referral_reconciler.close)
+dp.startup.register(ledger_checkpointer.start)
+dp.shutdown.register(ledger_checkpointer.close)
+
+# ✅ Registered last: the bot counts as ready once every other startup hook ran
+dp.startup.register(startup.mark_ready)
 
 # ✅ Register handlers
 dp.include_router(start.router)
@@ -54,27 +95,93 @@ dp.include_router(admin_router)
 dp.include_router(adduser_router)
 dp.include_router(removeuser_router)
 dp.include_router(list_users_router)
+dp.include_router(import_users_router)
+dp.include_router(analytics_router)
 dp.include_router(orders_router)
 
+# ✅ Startup steps (run by main() once the health check answers)
+def write_credentials():
+    """Retrieves Google Drive credentials from environment variables."""
+    google_credentials = os.getenv("GOOGLE_CREDENTIALS")
+    if google_credentials:
+        with open("credentials.json", "w") as f:
+            f.write(google_credentials)
+        print("✅ credentials.json file created successfully!")
+    else:
+        print("❌ GOOGLE_CREDENTIALS environment variable is missing!")
+
+def restore_database():
+    """Downloads the database from Google Drive (runs in a worker thread)."""
+    from gdrive import download_db  # Imported here so the Google API client loads off the event loop
+
+    return download_db(DB_PATH, GDRIVE_FOLDER_ID)
+
 # ✅ Dummy Web Server for Koyeb Health Check
 async def health_check(request):
-    return web.Response(text="OK")
+    # Always 200 so the platform doesn't restart a slow boot; /ready tells whether updates are handled
+    return web.Response(text="OK" if startup.ready else f"STARTING ({startup.current or 'dispatcher'})")
 
-async def run_web_server():
-    app = web.Application()
-    app.router.add_get("/", health_check)
+async def run_web_server(app):
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", 8000)
     await site.start()
+    return runner
+
+async def run_webhook():
+    """Serves updates pushed by Telegram until SIGTERM/SIGINT."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot)
+    logging.info("📬 Receiving updates by webhook")
+    await stop.wait()
+
+async def run_polling():
+    await bot.delete_webhook()  # getUpdates is refused while a webhook is set
+    await dp.start_polling(bot)
 
 # ✅ Main function (bot + web server)
 async def main():
     logging.info("🚀 Starting bot...")
-    await asyncio.gather(
-        dp.start_polling(bot),
-        run_web_server()
-    )
+    # Fork the PDF workers before any other thread starts
+    await startup.run("render_workers", render_service.start, in_thread=False)
+
+    app = web.Application()
+    app.router.add_get("/", health_check)
+    app.router.add_get("/ready", startup.handle_ready)
+    app.router.add_get("/metrics", metrics.handle_metrics)
+    webhook_handler = mount_webhook(app, dp, bot) if WEBHOOK_URL else None
+    if webhook_handler:
+        metrics.registry.register(metrics.StatsGauges("webhook", webhook_handler.stats))
+    runner = await startup.run("web_server", run_web_server, app)
+
+    use_webhook = False
+    try:
+        await startup.run("credentials", write_credentials, in_thread=False)
+        await startup.run("restore_db", restore_database, timeout=STARTUP_RESTORE_TIMEOUT)
+        await startup.run("migrations", run_migrations, DB_PATH, timeout=STARTUP_MIGRATE_TIMEOUT)
+        # Only once the restored database is in place, or it could be uploaded over the backup
+        await startup.run("backup", backup_scheduler.start, in_thread=False)
+
+        if webhook_handler:
+            use_webhook = await startup.run("set_webhook", set_webhook, dp, bot, timeout=30)
+        if use_webhook:
+            await run_webhook()
+        else:
+            if webhook_handler:
+                logging.warning("⚠️ Falling back to long polling")
+            await run_polling()
+    finally:
+        await runner.cleanup()  # Stops accepting updates and waits for the ones in flight
+        if use_webhook:
+            await dp.emit_shutdown(bot=bot)
+            await bot.session.close()
+        async_db.shutdown()
+        render_service.shutdown()
+        await asyncio.to_thread(backup_scheduler.stop)  # Forced flush of pending changes
 
 # ✅ Run the bot
 if __name__ == "__main__":
@@ -83,7 +190,7 @@ if __name__ == "__main__":
 import atexit
 
 def on_exit():
-    """Upload database when bot stops."""
-    upload_db(DB_PATH, GDRIVE_FOLDER_ID)
+    """Upload any unsaved database changes when bot stops."""
+    backup_scheduler.stop()
 
 atexit.register(on_exit)
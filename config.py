@@ -7,8 +7,48 @@ load_dotenv()
 load_dotenv()
 GDRIVE_FOLDER_ID = "126XootI_okGOiiwgL-8ZxHHtXs1LaKgE"  # Replace with your folder ID
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-ADMIN_ID = [814180858]  # Keep as a list
-  # Remove the list brackets
+ADMIN_ID = frozenset({814180858})  # Set of admin Telegram IDs (O(1) membership checks)
   # Ensure IDs are integers, not strings
 
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))  # Threads serving read queries
+BACKUP_WINDOW = float(os.getenv("BACKUP_WINDOW", "30"))  # Seconds of quiet before a backup upload
+BACKUP_MAX_STALENESS = float(os.getenv("BACKUP_MAX_STALENESS", "300"))  # Upload at least this often while writes keep coming
+BACKUP_MODE = os.getenv("BACKUP_MODE", "snapshot")  # "snapshot" = whole file, "replica" = changed pages only
+REPLICA_SNAPSHOT_EVERY = int(os.getenv("REPLICA_SNAPSHOT_EVERY", "50"))  # Segments between full snapshots
+DRIVE_API_URL = os.getenv("DRIVE_API_URL")  # Override the Google Drive endpoint (e.g. devtools/fake_drive.py)
+EMPLOYEE_CACHE_SIZE = int(os.getenv("EMPLOYEE_CACHE_SIZE", "10000"))  # Employee rows kept in memory
+EMPLOYEE_CACHE_TTL = float(os.getenv("EMPLOYEE_CACHE_TTL", "600"))  # Seconds before a cached row is re-read
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))  # PDF rendering processes (0 = render in a thread)
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "2"))  # Renders in flight at once; the rest queue
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))  # Telegram file_ids of unchanged reports kept for resending
+FSM_MEMORY_SIZE = int(os.getenv("FSM_MEMORY_SIZE", "5000"))  # Conversations kept in memory; the rest are read back from SQLite
+FSM_MEMORY_TTL = float(os.getenv("FSM_MEMORY_TTL", "900"))  # Seconds of inactivity before a conversation leaves memory
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(48 * 3600)))  # Seconds before an untouched form counts as abandoned
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "2"))  # Seconds between batched FSM state writes
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))  # Largest CSV accepted by /import_users
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "10"))  # Orders per page in the /orders history view
+EMPLOYEE_REPORT_CHUNK = int(os.getenv("EMPLOYEE_REPORT_CHUNK", "500"))  # Rows fetched per query by /list_users
+EMPLOYEE_REPORT_PART_ROWS = int(os.getenv("EMPLOYEE_REPORT_PART_ROWS", "5000"))  # Rows per PDF part before rolling over
+EMPLOYEE_REPORT_PART_BYTES = int(os.getenv("EMPLOYEE_REPORT_PART_BYTES", str(45 * 1024 * 1024)))  # Largest PDF part (Telegram caps bots at 50 MB)
+EMPLOYEE_REPORT_ROW_BYTES = int(os.getenv("EMPLOYEE_REPORT_ROW_BYTES", "2048"))  # Upper bound of PDF bytes per row (≈100 measured), sizes the parts
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public base URL (e.g. https://bazar.koyeb.app); unset = long polling
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")  # Route on the health-check web server that receives updates
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "40"))  # Updates processed at once; Telegram waits beyond that
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # Override the Bot API server (e.g. devtools/fake_telegram.py)
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))  # Bot-initiated messages per second, all chats together
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))  # Messages per second to any one chat
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))  # Messages a quiet chat may receive back to back
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "5"))  # Retries after flood control or network errors
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))  # Sends in flight at once
+ORDER_NOTIFY_MODE = os.getenv("ORDER_NOTIFY_MODE", "each")  # "each" = one PDF per order, "digest" = batched PDF for all admins
+DIGEST_INTERVAL = float(os.getenv("DIGEST_INTERVAL", "600"))  # Seconds between order digests
+DIGEST_MAX_ORDERS = int(os.getenv("DIGEST_MAX_ORDERS", "50"))  # Send the digest early once this many orders wait
+DIGEST_URGENT_QUANTITY = int(os.getenv("DIGEST_URGENT_QUANTITY", "0"))  # Orders of at least this quantity skip the digest (0 = off)
+REFERRAL_RECONCILE_INTERVAL = float(os.getenv("REFERRAL_RECONCILE_INTERVAL", "3600"))  # Seconds between referral counter drift checks (0 = off)
+REFERRAL_LEVEL_REWARDS = [int(amount) for amount in os.getenv("REFERRAL_LEVEL_REWARDS", "50").split(",")]  # DZD paid per new employee to the referrer, their referrer, ... ("50,20,10" = 3 levels)
+LEDGER_CHECKPOINT_INTERVAL = float(os.getenv("LEDGER_CHECKPOINT_INTERVAL", "3600"))  # Seconds between balance ledger checkpoints (0 = off)
+STARTUP_RESTORE_TIMEOUT = float(os.getenv("STARTUP_RESTORE_TIMEOUT", "120"))  # Max seconds to restore the database from Google Drive at boot
+STARTUP_MIGRATE_TIMEOUT = float(os.getenv("STARTUP_MIGRATE_TIMEOUT", "60"))  # Max seconds for schema migrations at boot
+
 #ranii modifyitoooo
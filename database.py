@@ -1,31 +1,36 @@
 import sqlite3
 import os
 import logging
-from config import GDRIVE_FOLDER_ID
+import threading
+from contextlib import contextmanager
+from async_db import reader, writer, run_read
+from cache import TTLCache, MISSING
+from config import EMPLOYEE_CACHE_SIZE, EMPLOYEE_CACHE_TTL, ORDERS_PAGE_SIZE
+from metrics import InstrumentedConnection
 
 DB_PATH = "bazarbot.db"
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# The transaction currently open on this thread (see transaction())
+_local = threading.local()
 
-def on_database_update():
-    """Uploads the database after modification."""
-    logging.info("🔄 Database changed! Uploading to Google Drive...")
+# Employee rows by telegram_id (None = not registered); see get_employee / invalidate_employee
+employee_cache = TTLCache(EMPLOYEE_CACHE_SIZE, EMPLOYEE_CACHE_TTL)
 
-    from gdrive import upload_db  # Import here to avoid circular dependency
 
-    try:
-        upload_db(DB_PATH, GDRIVE_FOLDER_ID)
-        logging.info("✅ Database uploaded successfully!")
-    except Exception as e:
-        logging.error(f"❌ Failed to upload database: {e}")
+def on_database_update():
+    """Schedules a Google Drive backup after modification (uploads are coalesced in the background)."""
+    from backup import backup_scheduler  # Import here to avoid circular dependency
+
+    backup_scheduler.mark_dirty()
 
 
 def get_db_connection():
-    """Returns a database connection with foreign key support."""
+    """Returns a database connection with foreign key support (statements are counted and timed for /metrics)."""
     try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
+        conn = sqlite3.connect(DB_PATH, timeout=10, factory=InstrumentedConnection)
         conn.execute("PRAGMA foreign_keys = ON;")
         return conn
     except sqlite3.Error as e:
@@ -33,116 +38,72 @@ def get_db_connection():
         return None
 
 
-def create_tables():
-    """Creates necessary tables."""
+@contextmanager
+def transaction():
+    """Runs a block of writes as a single BEGIN IMMEDIATE … COMMIT on one connection.
+
+    Nested calls join the transaction that is already open on this thread, so
+    write helpers compose into one atomic unit. Any exception rolls everything
+    back. The backup is scheduled once, after the outermost commit, and only
+    if something actually changed.
+    """
+    outer = getattr(_local, "conn", None)
+    if outer is not None:
+        yield outer
+        return
+
     conn = get_db_connection()
     if not conn:
-        return
+        raise sqlite3.OperationalError("could not open database connection")
 
+    conn.isolation_level = None  # We issue BEGIN/COMMIT ourselves
+    _local.conn, _local.after_commit = conn, []
     try:
-        cursor = conn.cursor()
-        cursor.executescript('''
-            CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE NOT NULL,
-                full_name TEXT NOT NULL,
-                phone_number TEXT NOT NULL,
-                invited_by INTEGER,
-                balance INTEGER DEFAULT 0,
-                earnings INTEGER DEFAULT 0,
-                date_joined TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                invite_count INTEGER DEFAULT 0,
-                FOREIGN KEY (invited_by) REFERENCES employees (id)
-            );
-        ''')
-        # Create referrals table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS referrals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                referrer_id INTEGER NOT NULL,
-                referred_id INTEGER NOT NULL,
-                referred_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (referrer_id) REFERENCES employees (id),
-                FOREIGN KEY (referred_id) REFERENCES employees (id),
-                UNIQUE (referred_id)  -- Ensures a user can only be referred once
-            )
-        ''')
-
-        # Create orders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                customer_fullname TEXT NOT NULL,
-                customer_phone TEXT NOT NULL,
-                product_name TEXT NOT NULL,
-                product_code TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                wilaya TEXT NOT NULL,
-                baladiya TEXT NOT NULL,
-                exact_address TEXT NOT NULL,
-                status TEXT DEFAULT 'Pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees (id)
-            )
-        ''')
-
-
-        # Create payement table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            employee_name TEXT NOT NULL,
-            phone_number TEXT NOT NULL,
-            amount INTEGER NOT NULL,
-            status TEXT CHECK( status IN ('pending', 'approved', 'paid') ) DEFAULT 'pending',
-            total_balance INTEGER NOT NULL,
-            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            approved_at TIMESTAMP NULL
-        )
-        ''')
-
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        changed = conn.total_changes > 0
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        callbacks = _local.after_commit
+        _local.conn, _local.after_commit = None, None
+        conn.close()
 
+    if changed:
+        on_database_update()  # 🔄 Schedule backup once per committed transaction
+    for callback in callbacks:
+        callback()
 
 
-        print("✅ All tables created successfully!")
-        conn.commit()
-        logging.info("✅ Database tables created successfully!")
-    except sqlite3.Error as e:
-        logging.error(f"❌ Error creating tables: {e}")
-    finally:
-        conn.close()
+def after_commit(callback):
+    """Runs `callback` once the current transaction commits (right away if there is none)."""
+    if getattr(_local, "conn", None) is None:
+        callback()
+    else:
+        _local.after_commit.append(callback)
 
 
 def modify_db(query, params=()):
     """Executes a database modification and triggers backup."""
-    conn = get_db_connection()
-    if not conn:
-        return
-
     try:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        on_database_update()  # 🔄 Auto-upload after modification
+        with transaction() as conn:
+            conn.execute(query, params)
     except sqlite3.Error as e:
         logging.error(f"❌ Database modification error: {e}")
-    finally:
-        conn.close()
-
-
-# ✅ Run table creation on startup
-create_tables()
-
-
-
 
 
 # ✅ Employee Functions
 def add_employee(telegram_id, full_name, phone_number, referrer_id=None):
-    """Adds a new employee to the database."""
-    with get_db_connection() as conn:
+    """Adds a new employee and rewards the referrer, all in one transaction.
+
+    `referrer_id` is the inviter's Telegram ID.
+    """
+    from handlers.referral_utils import add_referral  # Import here to avoid circular dependency
+
+    with transaction() as conn:
         cursor = conn.cursor()
 
         cursor.execute("SELECT id FROM employees WHERE telegram_id = ?", (telegram_id,))
@@ -150,6 +111,7 @@ def add_employee(telegram_id, full_name, phone_number, referrer_id=None):
             logging.warning(f"⚠️ Employee with Telegram ID {telegram_id} already exists!")
             return False
 
+        invited_by = None
         if referrer_id:
             cursor.execute("SELECT id FROM employees WHERE telegram_id = ?", (referrer_id,))
             referrer = cursor.fetchone()
@@ -157,35 +119,55 @@ def add_employee(telegram_id, full_name, phone_number, referrer_id=None):
                 logging.warning(f"⚠️ Invalid referral ID {referrer_id}. Skipping referral reward.")
                 referrer_id = None
             else:
-                referrer_id = referrer[0]
+                invited_by = referrer[0]
 
-        modify_db(
+        cursor.execute(
             "INSERT INTO employees (telegram_id, full_name, phone_number, invited_by) VALUES (?, ?, ?, ?)",
-            (telegram_id, full_name, phone_number, referrer_id)
+            (telegram_id, full_name, phone_number, invited_by)
         )
-        logging.info(f"✅ Employee {telegram_id} added successfully!")
+        invalidate_employee(telegram_id)  # May be cached as "not registered"
 
         if referrer_id:
-            from handlers.referral_utils import add_referral
             add_referral(referrer_id, telegram_id)
 
+    logging.info(f"✅ Employee {telegram_id} added successfully!")
     return True
 
 
 def get_employee(telegram_id):
-    """Fetches an employee from the database by Telegram ID."""
-    with get_db_connection() as conn:
+    """Fetches an employee by Telegram ID, served from the in-process cache when possible."""
+    cached = employee_cache.get(telegram_id)
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+    return _load_employee(telegram_id)
+
+
+def _load_employee(telegram_id):
+    """Reads an employee row from SQLite and caches it."""
+    token = employee_cache.token()
+    conn = get_db_connection()
+    try:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM employees WHERE telegram_id = ?", (telegram_id,))
         employee = cursor.fetchone()
-        return dict(employee) if employee else None
+    finally:
+        conn.close()
+
+    employee = dict(employee) if employee else None
+    employee_cache.put(telegram_id, employee, token)
+    return dict(employee) if employee else None
+
+
+def invalidate_employee(telegram_id):
+    """Drops a cached employee row once the current transaction commits."""
+    after_commit(lambda: employee_cache.invalidate(telegram_id))
 
 
 # ✅ Orders Functions
 def add_order(employee_telegram_id, customer_fullname, customer_phone, product_name, product_code, quantity, wilaya, baladiya, exact_address):
-    """Adds an order placed by an employee."""
-    with get_db_connection() as conn:
+    """Adds an order placed by an employee. Returns the new order ID, or False if the employee is unknown."""
+    with transaction() as conn:
         cursor = conn.cursor()
 
         cursor.execute("SELECT id FROM employees WHERE telegram_id = ?", (employee_telegram_id,))
@@ -196,13 +178,14 @@ def add_order(employee_telegram_id, customer_fullname, customer_phone, product_n
 
         employee_id = employee[0]
 
-        modify_db(
+        cursor.execute(
             "INSERT INTO orders (employee_id, customer_fullname, customer_phone, product_name, product_code, quantity, wilaya, baladiya, exact_address, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Pending')",
             (employee_id, customer_fullname, customer_phone, product_name, product_code, quantity, wilaya, baladiya, exact_address)
         )
-        logging.info(f"✅ Order stored for Employee {employee_telegram_id}")
+        order_id = cursor.lastrowid
 
-    return True
+    logging.info(f"✅ Order {order_id} stored for Employee {employee_telegram_id}")
+    return order_id
 
 
 def get_employee_orders(employee_telegram_id):
@@ -219,15 +202,43 @@ def get_employee_orders(employee_telegram_id):
         return cursor.fetchall()
 
 
+def get_employee_orders_page(employee_id, before_id=None, after_id=None, limit=ORDERS_PAGE_SIZE):
+    """Fetches one page of an employee's orders, newest first, by keyset on (employee_id, id).
+
+    Pass before_id to page towards older orders or after_id to page back
+    towards newer ones. Returns (rows, has_older, has_newer).
+    """
+    columns = "id, product_name, product_code, quantity, wilaya, baladiya, status"
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if after_id is not None:
+            cursor.execute(
+                f"SELECT {columns} FROM orders WHERE employee_id = ? AND id > ? ORDER BY id ASC LIMIT ?",
+                (employee_id, after_id, limit + 1)
+            )
+            rows = cursor.fetchall()
+            return list(reversed(rows[:limit])), True, len(rows) > limit
+
+        if before_id is not None:
+            cursor.execute(
+                f"SELECT {columns} FROM orders WHERE employee_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (employee_id, before_id, limit + 1)
+            )
+        else:
+            cursor.execute(
+                f"SELECT {columns} FROM orders WHERE employee_id = ? ORDER BY id DESC LIMIT ?",
+                (employee_id, limit + 1)
+            )
+        rows = cursor.fetchall()
+        return rows[:limit], len(rows) > limit, before_id is not None
+
+
 # ✅ Earnings Functions
 def get_employee_earnings(telegram_id):
     """Fetch total earnings and available balance for an employee."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT balance, earnings FROM employees WHERE telegram_id = ?", (telegram_id,))
-            result = cursor.fetchone()
-            return result if result else (0, 0)
+        employee = get_employee(telegram_id)
+        return (employee["balance"], employee["earnings"]) if employee else (0, 0)
     except sqlite3.Error as e:
         logging.error(f"Database error: {e}")
         return 0, 0
@@ -235,25 +246,85 @@ def get_employee_earnings(telegram_id):
 
 # ✅ Payment Requests
 def request_payment(telegram_id, amount):
-    """Request a payment if the employee has enough balance."""
-    with get_db_connection() as conn:
+    """Request a payment if the employee has enough balance, reserving the amount right away.
+
+    The balance check is part of the INSERT itself and the reservation is a
+    ledger debit in the same transaction, so concurrent /pay_me taps can never
+    spend the same balance twice. Returns (accepted, balance left).
+    """
+    with transaction() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("SELECT balance, full_name, phone_number FROM employees WHERE telegram_id = ?", (telegram_id,))
-        result = cursor.fetchone()
-        if not result:
-            return False, 0
+        cursor.execute("""
+            INSERT INTO payments (employee_id, employee_name, phone_number, amount, status, total_balance)
+            SELECT telegram_id, full_name, phone_number, ?, 'pending', balance FROM employees
+            WHERE telegram_id = ? AND balance >= MAX(?, 2000)
+        """, (amount, telegram_id, amount))
+        reserved = cursor.rowcount > 0
 
-        balance, full_name, phone_number = result
-        if balance < 2000 or amount > balance:
-            return False, balance
+        if reserved:
+            cursor.execute("""
+                INSERT INTO ledger_entries (employee_id, amount, kind, ref_id)
+                SELECT id, -?, 'payout', ? FROM employees WHERE telegram_id = ?
+            """, (amount, cursor.lastrowid, telegram_id))
+            invalidate_employee(telegram_id)
 
-        modify_db(
-            "INSERT INTO payments (employee_id, employee_name, phone_number, amount, status, total_balance) VALUES (?, ?, ?, ?, 'pending', ?)",
-            (telegram_id, full_name, phone_number, amount, balance)
-        )
-        return True, balance
+        result = cursor.execute("SELECT balance FROM employees WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        return reserved, result[0] if result else 0
 
 
-# ✅ Run table creation on startup
-create_tables()
+def release_payment(payment_id):
+    """Rejects a pending or approved payment request and gives its reserved amount back.
+
+    The release is a 'payout_release' ledger credit referencing the payment.
+    Returns (telegram_id, amount, balance) or None if the request does not
+    exist or was already paid or rejected.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        row = cursor.execute(
+            "SELECT employee_id, amount FROM payments WHERE id = ? AND status IN ('pending', 'approved')", (payment_id,)
+        ).fetchone()
+        if not row:
+            return None
+        telegram_id, amount = row
+
+        cursor.execute("UPDATE payments SET status = 'rejected' WHERE id = ?", (payment_id,))
+        cursor.execute("""
+            INSERT INTO ledger_entries (employee_id, amount, kind, ref_id)
+            SELECT id, ?, 'payout_release', ? FROM employees WHERE telegram_id = ?
+        """, (amount, payment_id, telegram_id))
+        invalidate_employee(telegram_id)
+
+        result = cursor.execute("SELECT balance FROM employees WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        return telegram_id, amount, result[0] if result else 0
+
+
+def get_table_versions(*tables):
+    """Returns the change counters of the given tables (see migrations/004_table_versions.sql)."""
+    with get_db_connection() as conn:
+        placeholders = ", ".join("?" for _ in tables)
+        rows = dict(conn.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})", tables
+        ).fetchall())
+        return tuple(rows.get(table, 0) for table in tables)
+
+
+
+# ✅ Awaitable versions for handlers (never block the event loop)
+async def get_employee_async(telegram_id):
+    """Cache hits are answered inline; only misses hop to the reader pool."""
+    cached = employee_cache.get(telegram_id)
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+    return await run_read(_load_employee, telegram_id)
+
+
+add_employee_async = writer(add_employee)
+add_order_async = writer(add_order)
+get_employee_orders_async = reader(get_employee_orders)
+get_employee_orders_page_async = reader(get_employee_orders_page)
+get_employee_earnings_async = reader(get_employee_earnings)
+request_payment_async = writer(request_payment)
+release_payment_async = writer(release_payment)
+get_table_versions_async = reader(get_table_versions)
@@ -0,0 +1,301 @@
+"""End-to-end throughput benchmark of the real dispatcher against an in-process fake Bot API.
+
+Builds the Dispatcher from bot.py (every router and middleware) on a fresh
+database in a temporary directory and feeds it synthetic updates through
+dp.feed_update, the way polling and the webhook do. Each simulated employee
+registers (with a referral to an earlier one), then places orders through
+the full 8-step /place_order wizard, opens /orders and taps /pay_me; the
+admin runs /list_users now and then. Results are saved as JSON so runs on
+different commits can be compared.
+
+    python -m devtools.bench --users 500 --concurrency 50 --output before.json
+    python -m devtools.bench --users 500 --concurrency 50 --output after.json
+    python -m devtools.bench --compare before.json after.json
+"""
+import argparse
+import asyncio
+import atexit
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = 814180858  # config.ADMIN_ID
+FAKE_TOKEN = "123456:ABCdefGhIJKlmnoPQRstuVWXyz0123456789"
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), falling back to the peak on other systems."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 3)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_fake_session(api_latency, calls):
+    """An aiogram session answering every Bot API method in-process, like devtools.fake_telegram does over HTTP."""
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Message
+
+    ids = itertools.count(1)
+
+    class FakeSession(BaseSession):
+        async def make_request(self, bot, method, timeout=None):
+            name = type(method).__name__
+            calls[name] = calls.get(name, 0) + 1
+            if api_latency:
+                await asyncio.sleep(api_latency)
+
+            if method.__returning__ is not Message:
+                return True
+            message = {
+                "message_id": next(ids),
+                "date": int(time.time()),
+                "chat": {"id": int(getattr(method, "chat_id", 0) or 0), "type": "private"},
+                "text": getattr(method, "text", None),
+                "caption": getattr(method, "caption", None),
+            }
+            if name == "SendDocument":
+                file_id = f"benchfile{message['message_id']}"
+                message["document"] = {"file_id": file_id, "file_unique_id": file_id}
+            return Message.model_validate(message, context={"bot": bot})
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+class Bench:
+    def __init__(self, dp, bot, args):
+        self.dp = dp
+        self.bot = bot
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.update_ids = itertools.count(1)
+        self.latencies = {}  # kind -> [seconds]
+        self.errors = 0
+        self.registered = []
+
+    def update(self, user_id, text):
+        from aiogram.types import Update
+
+        update_id = next(self.update_ids)
+        return Update.model_validate({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"Bench{user_id}"},
+                "text": text,
+            },
+        })
+
+    async def send(self, kind, user_id, text):
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, self.update(user_id, text))
+        except Exception:
+            self.errors += 1
+        self.latencies.setdefault(kind, []).append(time.perf_counter() - started)
+
+    async def employee(self, index):
+        user_id = 10_000_000 + index
+        referrer = self.random.choice(self.registered) if self.registered else 0
+        for text in ("/start", f"Bench Employee {index}", f"+21355{index:07d}", str(referrer)):
+            await self.send("register", user_id, text)
+        self.registered.append(user_id)
+
+        for n in range(self.args.orders_per_user):
+            answers = [
+                "/place_order", f"Customer {index}-{n}", f"06{index:08d}", f"Product {n % 7}",
+                f"P{n % 7:03d}", str(1 + n % 3), f"Wilaya {index % 58 + 1}", "Centre", f"{index} rue {n}",
+            ]
+            for text in answers:
+                await self.send("place_order", user_id, text)
+            await self.send("orders", user_id, "/orders")
+        await self.send("pay_me", user_id, "/pay_me")
+
+        if self.args.list_users_every and index % self.args.list_users_every == self.args.list_users_every - 1:
+            await self.send("list_users", ADMIN, "/list_users")
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.args.concurrency)
+
+        async def one(index):
+            async with slots:
+                await self.employee(index)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(self.args.users)))
+        return time.perf_counter() - started
+
+
+async def run_bench(args):
+    os.environ.setdefault("BOT_TOKEN", FAKE_TOKEN)
+    os.environ.setdefault("RENDER_WORKERS", str(args.render_workers))
+    workdir = tempfile.mkdtemp(prefix="bazarbot-bench-")
+    os.chdir(workdir)  # The database (and anything else bot.py writes) lives here, never in the repo
+    sys.path.insert(0, REPO_DIR)
+
+    rss_start = rss_mb()
+    import bot as bot_module
+    from aiogram import Bot
+    from migrate import run_migrations
+    from database import DB_PATH
+
+    atexit.unregister(bot_module.on_exit)  # Nothing to back up: the database is thrown away
+    logging.getLogger().setLevel(args.log_level)  # Per-update INFO lines would dominate the timings
+    rss_imported = rss_mb()
+
+    bot_module.render_service.start()
+    run_migrations(DB_PATH)
+    calls = {}
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=make_fake_session(args.api_latency / 1000, calls))
+    dp = bot_module.dp
+    await dp.emit_startup(bot=bot)
+
+    bench = Bench(dp, bot, args)
+    seconds = await bench.run()
+    rss_end = rss_mb()
+
+    await dp.emit_shutdown(bot=bot)
+    bot_module.async_db.shutdown()
+    bot_module.render_service.shutdown()
+
+    every = sorted(value for values in bench.latencies.values() for value in values)
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "orders_per_user": args.orders_per_user,
+            "list_users_every": args.list_users_every,
+            "api_latency_ms": args.api_latency,
+            "render_workers": int(os.environ["RENDER_WORKERS"]),
+            "seed": args.seed,
+        },
+        "updates": len(every),
+        "errors": bench.errors,
+        "seconds": round(seconds, 3),
+        "updates_per_sec": round(len(every) / seconds, 1) if seconds else None,
+        "latency_ms": {
+            "p50": percentile(every, 0.50),
+            "p90": percentile(every, 0.90),
+            "p99": percentile(every, 0.99),
+            "max": percentile(every, 1.0),
+        },
+        "by_kind": {
+            kind: {"updates": len(values), "p50": percentile(sorted(values), 0.50), "p99": percentile(sorted(values), 0.99)}
+            for kind, values in sorted(bench.latencies.items())
+        },
+        "api_calls": dict(sorted(calls.items())),
+        "rss_mb": {
+            "start": round(rss_start, 1),
+            "after_import": round(rss_imported, 1),
+            "end": round(rss_end, 1),
+            "growth": round(rss_end - rss_imported, 1),
+        },
+    }
+
+
+def print_result(result):
+    latency = result["latency_ms"]
+    print(f"📊 {result['updates']} updates in {result['seconds']} s → {result['updates_per_sec']} updates/s "
+          f"(p50 {latency['p50']} ms, p99 {latency['p99']} ms, {result['errors']} errors)")
+    for kind, stats in result["by_kind"].items():
+        print(f"   {kind:<12} {stats['updates']:>7} updates   p50 {stats['p50']:>9} ms   p99 {stats['p99']:>9} ms")
+    rss = result["rss_mb"]
+    print(f"🧠 RSS {rss['after_import']} MB after import → {rss['end']} MB at the end (+{rss['growth']} MB)")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    rows = [
+        ("updates/s", old["updates_per_sec"], new["updates_per_sec"], True),
+        ("p50 ms", old["latency_ms"]["p50"], new["latency_ms"]["p50"], False),
+        ("p99 ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"], False),
+        ("RSS growth MB", old["rss_mb"]["growth"], new["rss_mb"]["growth"], False),
+    ]
+    print(f"{'':<14} {old.get('label') or old.get('commit') or old_path:>14} {new.get('label') or new.get('commit') or new_path:>14}")
+    for name, before, after, higher_is_better in rows:
+        change = ""
+        if before and after is not None:
+            percent = (after - before) * 100 / before
+            better = percent > 0 if higher_is_better else percent < 0
+            change = f"{percent:+.1f}% {'✅' if better else '⚠️' if percent else ''}"
+        print(f"{name:<14} {before!s:>14} {after!s:>14}   {change}")
+    if old["config"] != new["config"]:
+        print("⚠️ The two runs used different settings:", old["config"], new["config"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's dispatcher end to end with a fake Bot API.")
+    parser.add_argument("--users", type=int, default=200, help="simulated employees")
+    parser.add_argument("--concurrency", type=int, default=20, help="employees active at the same time")
+    parser.add_argument("--orders-per-user", type=int, default=2, help="/place_order flows per employee")
+    parser.add_argument("--list-users-every", type=int, default=50, help="admin /list_users once per N employees (0 = never)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API round trip in ms")
+    parser.add_argument("--render-workers", type=int, default=2, help="PDF render processes (RENDER_WORKERS)")
+    parser.add_argument("--log-level", default="WARNING", help="logging level while the bench runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", help="name of this run in --compare output")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved results and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    output = os.path.abspath(args.output) if args.output else None  # Resolved before the bench changes directory
+    result = asyncio.run(run_bench(args))
+    print_result(result)
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Minimal in-memory Google Drive v3 endpoint for offline testing.
+
+Implements just what gdrive.DriveClient uses: files.list with name/parent
+filters, resumable create/update uploads, alt=media downloads and delete.
+
+    python -m devtools.fake_drive --port 8765
+    DRIVE_API_URL=http://127.0.0.1:8765/ python bot.py
+"""
+import argparse
+import itertools
+import json
+import re
+
+from aiohttp import web
+
+
+class FakeDrive:
+    def __init__(self):
+        self.files = {}  # file_id -> {"id", "name", "parents", "content"}
+        self.sessions = {}  # upload session id -> {"file_id" or "metadata", "buffer"}
+        self.requests = 0
+        self._ids = itertools.count(1)
+
+    def make_app(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.middlewares.append(self._count_requests)
+        app.router.add_get("/drive/v3/files", self.list_files)
+        app.router.add_get("/drive/v3/files/{file_id}", self.get_file)
+        app.router.add_delete("/drive/v3/files/{file_id}", self.delete_file)
+        app.router.add_post("/upload/drive/v3/files", self.start_create)
+        app.router.add_patch("/upload/drive/v3/files/{file_id}", self.start_update)
+        app.router.add_put("/upload/session/{session_id}", self.upload_chunk)
+        return app
+
+    @web.middleware
+    async def _count_requests(self, request, handler):
+        self.requests += 1
+        return await handler(request)
+
+    @staticmethod
+    def _not_found():
+        body = {"error": {"code": 404, "message": "File not found."}}
+        return web.json_response(body, status=404)
+
+    def _matches(self, f, query):
+        for name in re.findall(r"name\s*=\s*'([^']*)'", query):
+            if f["name"] != name:
+                return False
+        for fragment in re.findall(r"name contains '([^']*)'", query):
+            if fragment not in f["name"]:
+                return False
+        for parent in re.findall(r"'([^']*)' in parents", query):
+            if parent not in f["parents"]:
+                return False
+        return True
+
+    async def list_files(self, request):
+        query = request.query.get("q", "")
+        files = [{"id": f["id"], "name": f["name"]} for f in self.files.values() if self._matches(f, query)]
+        return web.json_response({"files": files})
+
+    async def get_file(self, request):
+        f = self.files.get(request.match_info["file_id"])
+        if not f:
+            return self._not_found()
+        if request.query.get("alt") == "media":
+            return web.Response(body=f["content"], content_type="application/octet-stream")
+        return web.json_response({"id": f["id"], "name": f["name"]})
+
+    async def delete_file(self, request):
+        if self.files.pop(request.match_info["file_id"], None) is None:
+            return self._not_found()
+        return web.Response(status=204)
+
+    def _start_session(self, request, **session):
+        session_id = str(next(self._ids))
+        self.sessions[session_id] = dict(session, buffer=bytearray())
+        location = f"{request.scheme}://{request.host}/upload/session/{session_id}"
+        return web.Response(status=200, headers={"Location": location})
+
+    async def start_create(self, request):
+        metadata = json.loads(await request.text() or "{}")
+        return self._start_session(request, metadata=metadata)
+
+    async def start_update(self, request):
+        file_id = request.match_info["file_id"]
+        if file_id not in self.files:
+            return self._not_found()
+        return self._start_session(request, file_id=file_id)
+
+    async def upload_chunk(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            return self._not_found()
+
+        session["buffer"].extend(await request.read())
+        total = request.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+        if total.isdigit() and len(session["buffer"]) < int(total):
+            return web.Response(status=308, headers={"Range": f"bytes=0-{len(session['buffer']) - 1}"})
+
+        del self.sessions[request.match_info["session_id"]]
+        if "file_id" in session:
+            f = self.files.get(session["file_id"])
+            if not f:
+                return self._not_found()
+        else:
+            file_id = f"fake{next(self._ids)}"
+            f = self.files[file_id] = {
+                "id": file_id,
+                "name": session["metadata"].get("name", "untitled"),
+                "parents": session["metadata"].get("parents", []),
+            }
+        f["content"] = bytes(session["buffer"])
+        return web.json_response({"id": f["id"], "name": f["name"]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an in-memory fake Google Drive API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    web.run_app(FakeDrive().make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Minimal in-memory Telegram Bot API for offline testing of polling and webhook mode.
+
+Answers the Bot API methods the bot calls (sendMessage, sendDocument,
+setWebhook, getUpdates, ...) and records every call. Updates can be queued
+for getUpdates or, once a webhook is set, POSTed to it with the secret token.
+
+    python -m devtools.fake_telegram --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 WEBHOOK_URL=http://127.0.0.1:8000 python bot.py
+    python -m devtools.fake_telegram --post 1000 --api http://127.0.0.1:8081   # push 1000 updates
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake Bazar", "username": "fake_bazar_bot"}
+
+
+def make_update(update_id, user_id, text):
+    """A private text message update from `user_id`."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.calls = []  # (method, params)
+        self.webhook = None  # {"url", "secret_token"}
+        self.updates = asyncio.Queue()
+        self.delivered = 0
+        self.delivery_seconds = []
+        self._ids = itertools.count(1)
+
+    def make_app(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/bot{token}/{method}", self.call_method)
+        app.router.add_post("/fake/updates", self.queue_updates)
+        app.router.add_get("/fake/calls", self.list_calls)
+        return app
+
+    async def _params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                params[part.name] = part.filename or (await part.text())
+        else:
+            params = dict(await request.post())
+        return params
+
+    async def call_method(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls.append((method, params))
+
+        handler = getattr(self, f"api_{method.lower()}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, params, **extra):
+        return {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    async def api_getme(self, params):
+        return BOT_USER
+
+    async def api_sendmessage(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    async def api_senddocument(self, params):
+        file_id = f"fakefile{next(self._ids)}"
+        document = {"file_id": file_id, "file_unique_id": file_id, "file_name": params.get("document")}
+        return self._message(params, document=document, caption=params.get("caption"))
+
+    async def api_editmessagetext(self, params):
+        return True
+
+    async def api_setwebhook(self, params):
+        self.webhook = {"url": params["url"], "secret_token": params.get("secret_token")}
+        return True
+
+    async def api_deletewebhook(self, params):
+        self.webhook = None
+        return True
+
+    async def api_getupdates(self, params):
+        if self.webhook:
+            return []  # Telegram refuses getUpdates while a webhook is set; keep it simple
+        timeout = min(float(params.get("timeout") or 0), 1.0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self.updates.empty() and len(updates) < 100:
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    async def queue_updates(self, request):
+        """POST /fake/updates {"count": N, "text": "/profile"}: deliver N updates by webhook or getUpdates."""
+        body = await request.json()
+        updates = [
+            make_update(next(self._ids), 1000 + i % body.get("users", 50), body.get("text", "/profile"))
+            for i in range(body.get("count", 1))
+        ]
+        if self.webhook:
+            asyncio.create_task(self.post_updates(updates, body.get("concurrency", 40)))
+        else:
+            for update in updates:
+                self.updates.put_nowait(update)
+        return web.json_response({"queued": len(updates), "webhook": bool(self.webhook)})
+
+    async def post_updates(self, updates, concurrency):
+        """POSTs updates to the webhook the way Telegram does, with at most `concurrency` in flight."""
+        headers = {}
+        if self.webhook["secret_token"]:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+        slots = asyncio.Semaphore(concurrency)
+
+        async with aiohttp.ClientSession() as session:
+            async def post(update):
+                async with slots:
+                    started = time.monotonic()
+                    async with session.post(self.webhook["url"], json=update, headers=headers) as response:
+                        await response.read()
+                        if response.status == 200:
+                            self.delivered += 1
+                            self.delivery_seconds.append(time.monotonic() - started)
+
+            await asyncio.gather(*(post(update) for update in updates))
+
+    async def list_calls(self, request):
+        counts = {}
+        for method, _ in self.calls:
+            counts[method] = counts.get(method, 0) + 1
+        seconds = sorted(self.delivery_seconds)
+        return web.json_response({
+            "calls": counts,
+            "webhook": self.webhook,
+            "delivered": self.delivered,
+            "p50_delivery_ms": round(seconds[len(seconds) // 2] * 1000, 2) if seconds else None,
+        })
+
+
+async def push(api, count, text, users):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{api}/fake/updates", json={"count": count, "text": text, "users": users}) as response:
+            print(json.dumps(await response.json()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an in-memory fake Telegram Bot API, or push updates to one.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--post", type=int, metavar="N", help="push N updates to a running fake server and exit")
+    parser.add_argument("--api", default="http://127.0.0.1:8081", help="fake server used by --post")
+    parser.add_argument("--text", default="/profile", help="message text of pushed updates")
+    parser.add_argument("--users", type=int, default=50, help="distinct senders of pushed updates")
+    args = parser.parse_args()
+
+    if args.post:
+        asyncio.run(push(args.api, args.post, args.text, args.users))
+    else:
+        web.run_app(FakeTelegram().make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
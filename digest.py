@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.methods import SendDocument
+from aiogram.types import BufferedInputFile
+
+from async_db import reader, writer
+from config import ADMIN_ID, ORDER_NOTIFY_MODE, DIGEST_INTERVAL, DIGEST_MAX_ORDERS, DIGEST_URGENT_QUANTITY
+from database import get_db_connection, transaction
+from outbox import outbox, NORMAL, URGENT
+from pdf_reports import render_new_order, render_order_digest
+from rendering import render_service
+
+
+def get_undigested_orders(limit):
+    """Fetches up to `limit` orders placed after the digest watermark, oldest first."""
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT o.id, o.created_at, e.full_name, o.customer_fullname, o.customer_phone, o.product_name,
+                   o.product_code, o.quantity, o.wilaya, o.baladiya, o.exact_address
+            FROM orders o JOIN employees e ON e.id = o.employee_id
+            WHERE o.id > (SELECT last_order_id FROM order_digest WHERE id = 1)
+              AND o.id NOT IN (SELECT order_id FROM order_digest_sent)
+            ORDER BY o.id LIMIT ?
+        """, (limit,)).fetchall()
+
+
+def count_undigested_orders():
+    with get_db_connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM orders WHERE id > (SELECT last_order_id FROM order_digest WHERE id = 1) "
+            "AND id NOT IN (SELECT order_id FROM order_digest_sent)"
+        ).fetchone()[0]
+
+
+def mark_sent(order_id):
+    """Keeps an order that was sent on its own out of the next digest."""
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO order_digest_sent (order_id) VALUES (?)", (order_id,))
+
+
+def advance_watermark(last_order_id):
+    with transaction() as conn:
+        conn.execute("UPDATE order_digest SET last_order_id = MAX(last_order_id, ?) WHERE id = 1", (last_order_id,))
+        conn.execute("DELETE FROM order_digest_sent WHERE order_id <= ?", (last_order_id,))
+
+
+get_undigested_orders_async = reader(get_undigested_orders)
+count_undigested_orders_async = reader(count_undigested_orders)
+mark_sent_async = writer(mark_sent)
+advance_watermark_async = writer(advance_watermark)
+
+
+def is_urgent(data):
+    return bool(data.get("urgent")) or (DIGEST_URGENT_QUANTITY > 0 and data.get("quantity", 0) >= DIGEST_URGENT_QUANTITY)
+
+
+class OrderDigest:
+    """Batches new-order notifications into one PDF for all admins.
+
+    A digest goes out every `interval` seconds, or as soon as `max_orders`
+    orders are waiting. The watermark lives in the order_digest table, so
+    orders placed just before a restart are still included in the next
+    digest. Urgent orders are sent on their own right away instead.
+    """
+
+    def __init__(self, mode=ORDER_NOTIFY_MODE, interval=DIGEST_INTERVAL, max_orders=DIGEST_MAX_ORDERS):
+        self.mode = mode
+        self.interval = interval
+        self.max_orders = max_orders
+
+        self._bot = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._wakeup = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+        self.digests = 0
+        self.digested_orders = 0
+        self.urgent = 0
+
+    async def start(self, bot: Bot, **kwargs):
+        """Dispatcher startup hook: picks up orders left over from before a restart."""
+        if self.mode != "digest" or self._task:
+            return
+        self._bot = bot
+        self._pending = await count_undigested_orders_async()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logging.info(f"🧾 Order digest every {self.interval:.0f} s or {self.max_orders} orders ({self._pending} waiting)")
+
+    async def notify(self, bot: Bot, order_id, data, employee):
+        """Called for every new order; only urgent ones (or every one, in "each" mode) are sent right away."""
+        urgent = is_urgent(data)
+        if self.mode != "digest" or urgent:
+            self.urgent += urgent
+            if self.mode == "digest":
+                await mark_sent_async(order_id)
+            pdf_bytes = await render_service.render(render_new_order, order_id, data, employee)
+            caption = "🚨 URGENT order received" if urgent else "📄 New Order Received"
+            for admin in sorted(ADMIN_ID):
+                pdf_file = BufferedInputFile(pdf_bytes, filename=f"order_{order_id}.pdf")
+                outbox.send(bot, SendDocument(chat_id=admin, document=pdf_file, caption=caption), URGENT if urgent else NORMAL)
+            return
+
+        if self._task is None:
+            await self.start(bot)  # Its count already includes this order
+        else:
+            self._pending += 1
+        if self._pending >= self.max_orders:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            timeout = max(0.0, self._last_flush + self.interval - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"❌ Order digest failed, will retry: {e}")
+
+    async def flush(self):
+        """Sends every waiting order, in digests of at most max_orders orders."""
+        async with self._lock:
+            self._last_flush = time.monotonic()
+            while True:
+                orders = await get_undigested_orders_async(self.max_orders)
+                if not orders:
+                    self._pending = 0
+                    return
+
+                pdf_bytes = await render_service.render(render_order_digest, orders)
+                caption = f"🧾 Order digest: {len(orders)} new order{'s' if len(orders) > 1 else ''} (#{orders[0][0]}–#{orders[-1][0]})"
+                for admin in sorted(ADMIN_ID):
+                    pdf_file = BufferedInputFile(pdf_bytes, filename=f"orders_{orders[0][0]}_{orders[-1][0]}.pdf")
+                    outbox.send(self._bot, SendDocument(chat_id=admin, document=pdf_file, caption=caption))
+
+                await advance_watermark_async(orders[-1][0])
+                self._pending = max(0, self._pending - len(orders))
+                self.digests += 1
+                self.digested_orders += len(orders)
+
+    async def close(self, **kwargs):
+        """Dispatcher shutdown hook: sends what is waiting, then stops."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            await self.flush()
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "pending": self._pending,
+            "digests": self.digests,
+            "digested_orders": self.digested_orders,
+            "urgent": self.urgent,
+        }
+
+
+order_digest = OrderDigest()
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+
+from async_db import run_read, run_write
+from config import FSM_MEMORY_SIZE, FSM_MEMORY_TTL, FSM_STATE_TTL, FSM_FLUSH_INTERVAL
+from database import get_db_connection, transaction
+
+SWEEP_INTERVAL = 60  # Seconds between purges of abandoned conversations
+
+
+class _Record:
+    __slots__ = ("state", "data", "touched", "accessed")
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data or {}
+        self.touched = time.time()  # Last change; persisted as updated_at
+        self.accessed = self.touched  # Last read or change; drives memory eviction
+
+    @property
+    def empty(self):
+        return self.state is None and not self.data
+
+
+def _key(key: StorageKey):
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.business_connection_id or ''}:{key.destiny}"
+
+
+def _load_record(storage_key):
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT state, data, updated_at FROM fsm_state WHERE storage_key = ?", (storage_key,)).fetchone()
+    if not row:
+        return None
+    record = _Record(row[0], json.loads(row[1]))
+    record.touched = row[2]
+    return record
+
+
+def _write_batch(upserts, deletes):
+    with transaction() as conn:
+        if upserts:
+            conn.executemany("""
+                INSERT INTO fsm_state (storage_key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (storage_key) DO UPDATE SET state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+            """, upserts)
+        if deletes:
+            conn.executemany("DELETE FROM fsm_state WHERE storage_key = ?", [(key,) for key in deletes])
+
+
+def _expire_records(cutoff):
+    with transaction() as conn:
+        return conn.execute("DELETE FROM fsm_state WHERE updated_at < ?", (cutoff,)).rowcount
+
+
+class SQLiteStorage(BaseStorage):
+    """aiogram FSM storage: a bounded in-memory tier in front of the fsm_state table.
+
+    Conversations live in an LRU of at most `memory_size` entries; entries idle
+    for `memory_ttl` seconds are dropped from memory and read back from SQLite
+    if the user returns. Changes are written in batches every `flush_interval`
+    seconds, so an in-flight order survives a restart (and, through the Drive
+    backup, a redeploy). Forms left untouched for `state_ttl` seconds count as
+    abandoned and are deleted.
+    """
+
+    def __init__(self, memory_size=FSM_MEMORY_SIZE, memory_ttl=FSM_MEMORY_TTL,
+                 state_ttl=FSM_STATE_TTL, flush_interval=FSM_FLUSH_INTERVAL):
+        self.memory_size = memory_size
+        self.memory_ttl = memory_ttl
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+
+        self._memory = OrderedDict()  # storage key -> _Record
+        self._pending = {}  # storage key -> _Record not yet written to SQLite
+        self._flushing = {}  # the batch currently being written
+        self._flush_task = None
+        self._last_sweep = time.time()
+
+        self.loads = 0
+        self.spilled = 0
+        self.abandoned = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    # BaseStorage API
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._get(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get(key)).data.copy()
+
+    async def close(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # Memory tier
+
+    async def _get(self, key):
+        storage_key = _key(key)
+        record = self._memory.get(storage_key)
+        if record is not None:
+            record.accessed = time.time()
+            self._memory.move_to_end(storage_key)
+            return record
+
+        # Not in memory: the newest copy is unflushed, being flushed, or in SQLite
+        record = self._pending.get(storage_key) or self._flushing.get(storage_key)
+        if record is None:
+            self.loads += 1
+            record = await run_read(_load_record, storage_key)
+            if storage_key in self._memory:  # Another update for this user got here first
+                return self._memory[storage_key]
+            if record is None or record.touched < time.time() - self.state_ttl:
+                record = _Record()  # Abandoned forms are not resumed; the sweep deletes them
+        record.accessed = time.time()
+        self._remember(storage_key, record)
+        return record
+
+    def _touch(self, key, record):
+        record.touched = record.accessed = time.time()
+        storage_key = _key(key)
+        self._pending[storage_key] = record
+        self._remember(storage_key, record)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def _remember(self, storage_key, record):
+        self._memory[storage_key] = record
+        self._memory.move_to_end(storage_key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)  # Still in _pending if it has unsaved changes
+            self.spilled += 1
+
+    def _evict_idle(self, now):
+        while self._memory:
+            storage_key, record = next(iter(self._memory.items()))
+            if record.accessed > now - self.memory_ttl:
+                break
+            del self._memory[storage_key]
+            self.spilled += 1
+
+    # Persistence
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"❌ FSM state flush failed: {e}")
+
+    async def flush(self):
+        """Writes pending changes in one transaction and expires idle and abandoned conversations."""
+        now = time.time()
+        self._evict_idle(now)
+
+        if self._pending and not self._flushing:
+            self._flushing, self._pending = self._pending, {}
+            upserts, deletes = [], []
+            for storage_key, record in self._flushing.items():
+                if record.empty:
+                    deletes.append(storage_key)
+                else:
+                    upserts.append((storage_key, record.state, json.dumps(record.data), record.touched))
+            try:
+                await run_write(_write_batch, upserts, deletes)
+                self.flushes += 1
+                self.rows_written += len(upserts) + len(deletes)
+            except Exception:
+                # Keep the batch, unless newer changes replaced it meanwhile
+                self._pending = {**self._flushing, **self._pending}
+                raise
+            finally:
+                self._flushing = {}
+
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._last_sweep = now
+            self.abandoned += await run_write(_expire_records, now - self.state_ttl)
+
+    def stats(self):
+        return {
+            "in_memory": len(self._memory),
+            "live": sum(1 for record in self._memory.values() if record.state is not None),
+            "pending_writes": len(self._pending),
+            "loads": self.loads,
+            "spilled": self.spilled,
+            "abandoned": self.abandoned,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+fsm_storage = SQLiteStorage()
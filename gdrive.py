@@ -1,10 +1,20 @@
+import asyncio
+import io
 import os
 import json
 import logging
+import threading
 
+import httplib2
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload, MediaIoBaseUpload
+
+from config import DRIVE_API_URL
+from metrics import drive_transfer
 
 # Google Drive Configuration
 SCOPES = ['https://www.googleapis.com/auth/drive']
@@ -15,83 +25,274 @@ DB_PATH = "bazarbot.db"  # Define DB_PATH directly here
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def get_drive_service():
-    """Authenticate and return the Google Drive API service."""
-    if not os.path.exists(CREDENTIALS_PATH):
-        logging.error("❌ credentials.json file not found! Make sure it exists.")
-        return None
+def is_not_found(error):
+    """True when Drive says the file (or a cached ID) no longer exists."""
+    return isinstance(error, HttpError) and error.resp.status == 404
 
-    try:
-        with open(CREDENTIALS_PATH, "r") as file:
-            service_account_info = json.load(file)
 
-        creds = service_account.Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
-        return build('drive', 'v3', credentials=creds)
-    except Exception as e:
-        logging.error(f"❌ Failed to authenticate with Google Drive API: {e}")
-        return None
+class DriveClient:
+    """Long-lived Google Drive client.
 
+    Credentials and the API service are built once (from the discovery
+    document bundled with googleapiclient, so no discovery round trip), and
+    file IDs are remembered per (folder, name) until Drive answers 404.
+    All calls share one HTTP connection, so they are serialized with a lock;
+    the *_async variants run them in a worker thread.
+    """
 
-def get_existing_file_id(service, file_name, folder_id):
-    """Check if file exists in Google Drive and return its file ID."""
-    try:
-        results = service.files().list(
-            q=f"name='{file_name}' and '{folder_id}' in parents and trashed=false",
-            fields="files(id)"
-        ).execute()
-        files = results.get('files', [])
-        return files[0]['id'] if files else None
-    except Exception as e:
-        logging.error(f"❌ Failed to check file existence in Google Drive: {e}")
-        return None
+    def __init__(self, credentials_path=CREDENTIALS_PATH, api_url=DRIVE_API_URL):
+        self.credentials_path = credentials_path
+        self.api_url = api_url  # Set to point the client at a local fake Drive (devtools/fake_drive.py)
+        self._lock = threading.RLock()
+        self._service = None
+        self._file_ids = {}
 
+    def service(self):
+        """Returns the cached Drive API service, building it on first use."""
+        with self._lock:
+            if self._service is None:
+                self._service = self._build_service()
+            return self._service
 
-def upload_db(db_path, folder_id):
-    """Upload or replace the SQLite database on Google Drive."""
-    service = get_drive_service()
-    if not service:
-        return
+    def _build_service(self):
+        discovery_doc = json.loads(get_static_doc("drive", "v3"))
 
-    file_name = os.path.basename(db_path)
-    if not os.path.exists(db_path):
-        logging.warning("⚠️ Database file not found! Creating a new one...")
-        open(db_path, 'w').close()
+        if self.api_url:
+            discovery_doc["rootUrl"] = self.api_url.rstrip("/") + "/"
+            logging.info(f"🧪 Using Google Drive endpoint {discovery_doc['rootUrl']}")
+            return build_from_document(discovery_doc, http=httplib2.Http())
 
-    try:
-        media = MediaFileUpload(db_path, mimetype='application/x-sqlite3', resumable=True)
-        existing_file_id = get_existing_file_id(service, file_name, folder_id)
-
-        if existing_file_id:
-            logging.info("🔄 Updating database on Google Drive...")
-            service.files().update(fileId=existing_file_id, media_body=media).execute()
-        else:
-            logging.info("🆕 Uploading new database to Google Drive...")
-            service.files().create(body={'name': file_name, 'parents': [folder_id]}, media_body=media).execute()
-        logging.info("✅ Database uploaded successfully!")
-    except Exception as e:
-        logging.error(f"❌ Failed to upload database: {e}")
+        if not os.path.exists(self.credentials_path):
+            logging.error("❌ credentials.json file not found! Make sure it exists.")
+            return None
 
+        try:
+            with open(self.credentials_path, "r") as file:
+                service_account_info = json.load(file)
 
-def download_db(db_path, folder_id):
-    """Download the SQLite database from Google Drive and replace local file."""
-    service = get_drive_service()
-    if not service:
-        return
+            creds = service_account.Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+            # AuthorizedHttp refreshes the access token only when it expires
+            return build_from_document(discovery_doc, http=AuthorizedHttp(creds, http=httplib2.Http()))
+        except Exception as e:
+            logging.error(f"❌ Failed to authenticate with Google Drive API: {e}")
+            return None
 
-    file_name = os.path.basename(db_path)
-    file_id = get_existing_file_id(service, file_name, folder_id)
+    def reset(self):
+        """Drops the cached service and file IDs (e.g. after credentials change)."""
+        with self._lock:
+            self._service = None
+            self._file_ids.clear()
 
-    if not file_id:
-        logging.error(f"❌ Database file '{file_name}' not found in Google Drive!")
-        return
+    def _execute(self, request):
+        with self._lock:
+            return request.execute()
 
-    try:
-        request = service.files().get_media(fileId=file_id)
-        with open(db_path, "wb") as db_file:
-            downloader = MediaIoBaseDownload(db_file, request)
+    def file_id(self, file_name, folder_id):
+        """Returns the ID of `file_name` in the folder, asking Drive only on a cache miss."""
+        key = (folder_id, file_name)
+        with self._lock:
+            if key in self._file_ids:
+                return self._file_ids[key]
+
+            results = self._execute(self.service().files().list(
+                q=f"name='{file_name}' and '{folder_id}' in parents and trashed=false",
+                fields="files(id)"
+            ))
+            files = results.get('files', [])
+            if not files:
+                return None
+            self._file_ids[key] = files[0]['id']
+            return files[0]['id']
+
+    def forget(self, file_name, folder_id):
+        """Invalidates a cached file ID."""
+        with self._lock:
+            self._file_ids.pop((folder_id, file_name), None)
+
+    def list_files(self, prefix, folder_id):
+        """Lists (name, file_id) pairs in the folder whose name starts with `prefix`."""
+        files = []
+        page_token = None
+        while True:
+            results = self._execute(self.service().files().list(
+                q=f"name contains '{prefix}' and '{folder_id}' in parents and trashed=false",
+                fields="nextPageToken, files(id, name)",
+                pageToken=page_token,
+            ))
+            files.extend((f['name'], f['id']) for f in results.get('files', []) if f['name'].startswith(prefix))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        with self._lock:
+            for name, file_id in files:
+                self._file_ids[(folder_id, name)] = file_id
+        return files
+
+    @drive_transfer("upload_file", lambda args, result: os.path.getsize(args[1]))
+    def upload_file(self, path, folder_id, file_name=None):
+        """Uploads or replaces a local file on Google Drive. Returns True on success."""
+        service = self.service()
+        if not service:
+            return False
+
+        file_name = file_name or os.path.basename(path)
+        if not os.path.exists(path):
+            logging.warning("⚠️ Database file not found! Creating a new one...")
+            open(path, 'w').close()
+
+        try:
+            existing_file_id = self.file_id(file_name, folder_id)
+            if existing_file_id:
+                logging.info(f"🔄 Updating {file_name} on Google Drive...")
+                try:
+                    media = MediaFileUpload(path, mimetype='application/x-sqlite3', resumable=True)
+                    self._execute(service.files().update(fileId=existing_file_id, media_body=media))
+                    logging.info(f"✅ {file_name} uploaded successfully!")
+                    return True
+                except HttpError as e:
+                    if not is_not_found(e):
+                        raise
+                    logging.warning(f"⚠️ Cached file ID for {file_name} is gone, creating a new file...")
+                    self.forget(file_name, folder_id)
+
+            logging.info(f"🆕 Uploading new {file_name} to Google Drive...")
+            media = MediaFileUpload(path, mimetype='application/x-sqlite3', resumable=True)
+            created = self._execute(service.files().create(
+                body={'name': file_name, 'parents': [folder_id]}, media_body=media, fields="id"
+            ))
+            with self._lock:
+                self._file_ids[(folder_id, file_name)] = created['id']
+            logging.info(f"✅ {file_name} uploaded successfully!")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Failed to upload {file_name}: {e}")
+            return False
+
+    @drive_transfer("download_file", lambda args, result: os.path.getsize(args[3]))
+    def download_file(self, file_name, folder_id, path):
+        """Downloads `file_name` from the folder to a local path. Returns True on success."""
+        service = self.service()
+        if not service:
+            return False
+
+        for _ in range(2):  # Second pass only if the cached ID turned out stale
+            try:
+                file_id = self.file_id(file_name, folder_id)
+                if not file_id:
+                    logging.error(f"❌ File '{file_name}' not found in Google Drive!")
+                    return False
+                with open(path, "wb") as f:
+                    self._download_to(file_id, f)
+                return True
+            except HttpError as e:
+                if not is_not_found(e):
+                    logging.error(f"❌ Failed to download {file_name}: {e}")
+                    return False
+                self.forget(file_name, folder_id)
+            except Exception as e:
+                logging.error(f"❌ Failed to download {file_name}: {e}")
+                return False
+        return False
+
+    def _download_to(self, file_id, fd):
+        with self._lock:
+            downloader = MediaIoBaseDownload(fd, self.service().files().get_media(fileId=file_id))
             done = False
             while not done:
                 _, done = downloader.next_chunk()
-        logging.info("✅ Database downloaded successfully!")
+
+    @drive_transfer("upload_bytes", lambda args, result: len(args[1]))
+    def upload_bytes(self, data, file_name, folder_id):
+        """Creates a new file in the folder from an in-memory payload."""
+        media = MediaIoBaseUpload(io.BytesIO(data), mimetype='application/octet-stream', resumable=True)
+        created = self._execute(self.service().files().create(
+            body={'name': file_name, 'parents': [folder_id]}, media_body=media, fields="id"
+        ))
+        with self._lock:
+            self._file_ids[(folder_id, file_name)] = created['id']
+        return created['id']
+
+    @drive_transfer("download_bytes", lambda args, result: len(result))
+    def download_bytes(self, file_id):
+        """Downloads a file's content into memory."""
+        buffer = io.BytesIO()
+        self._download_to(file_id, buffer)
+        return buffer.getvalue()
+
+    def delete_file(self, file_id):
+        """Deletes a file from Google Drive and drops it from the ID cache."""
+        self._execute(self.service().files().delete(fileId=file_id))
+        with self._lock:
+            for key in [k for k, v in self._file_ids.items() if v == file_id]:
+                del self._file_ids[key]
+
+    async def upload_file_async(self, path, folder_id, file_name=None):
+        return await asyncio.to_thread(self.upload_file, path, folder_id, file_name)
+
+    async def download_file_async(self, file_name, folder_id, path):
+        return await asyncio.to_thread(self.download_file, file_name, folder_id, path)
+
+    async def upload_bytes_async(self, data, file_name, folder_id):
+        return await asyncio.to_thread(self.upload_bytes, data, file_name, folder_id)
+
+    async def download_bytes_async(self, file_id):
+        return await asyncio.to_thread(self.download_bytes, file_id)
+
+
+drive_client = DriveClient()
+
+
+def get_drive_service():
+    """Authenticate and return the (cached) Google Drive API service."""
+    return drive_client.service()
+
+
+def upload_db(db_path, folder_id, file_name=None):
+    """Upload or replace the SQLite database on Google Drive. Returns True on success."""
+    return drive_client.upload_file(db_path, folder_id, file_name)
+
+
+def download_db(db_path, folder_id):
+    """Download the SQLite database from Google Drive and replace local file.
+
+    Prefers the incremental replica (snapshot + page segments) when one exists,
+    otherwise falls back to the whole-file copy.
+    """
+    if not drive_client.service():
+        return False
+
+    from replication import restore_replica  # Import here to avoid circular dependency
+
+    try:
+        if restore_replica(drive_client, db_path, folder_id):
+            return True
     except Exception as e:
-        logging.error(f"❌ Failed to download database: {e}")
+        logging.error(f"❌ Failed to restore database replica, falling back to full copy: {e}")
+
+    tmp_path = f"{db_path}.download"
+    if not drive_client.download_file(os.path.basename(db_path), folder_id, tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    remove_stale_wal(db_path)
+    os.replace(tmp_path, db_path)
+    logging.info("✅ Database downloaded successfully!")
+    return True
+
+
+async def upload_db_async(db_path, folder_id, file_name=None):
+    """Awaitable upload_db that keeps the event loop free."""
+    return await asyncio.to_thread(upload_db, db_path, folder_id, file_name)
+
+
+async def download_db_async(db_path, folder_id):
+    """Awaitable download_db that keeps the event loop free."""
+    return await asyncio.to_thread(download_db, db_path, folder_id)
+
+
+def remove_stale_wal(db_path):
+    """Deletes leftover WAL/SHM files so SQLite doesn't replay them over a restored database."""
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
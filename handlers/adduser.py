@@ -1,18 +1,16 @@
 import sqlite3
 from aiogram import Router, types, F
 from aiogram.filters import Command
-from database import get_db_connection
-from config import ADMIN_ID
+from database import transaction, invalidate_employee
+from async_db import writer
 
 router = Router()
 
 @router.message(Command("add_user"))
-async def add_user_command(message: types.Message):
+async def add_user_command(message: types.Message, is_admin: bool):
     """Handles /add_user command for admin to add a new employee."""
 
-    print(f"🔍 User ID: {message.from_user.id} | Admin List: {ADMIN_ID}")  # Debug
-
-    if message.from_user.id not in ADMIN_ID:
+    if not is_admin:
         await message.reply("⛔ You are not authorized to use this command.")
         return
 
@@ -26,7 +24,7 @@ async def add_user_command(message: types.Message):
         full_name = args[2]
         phone_number = args[3]
 
-        if add_employee(telegram_id, full_name, phone_number):
+        if await add_employee_async(telegram_id, full_name, phone_number):
             await message.reply(f"✅ Employee {full_name} (ID: {telegram_id}) added successfully!")
         else:
             await message.reply(f"⚠️ Employee with Telegram ID {telegram_id} already exists!")
@@ -36,13 +34,15 @@ async def add_user_command(message: types.Message):
 def add_employee(telegram_id: int, full_name: str, phone_number: str) -> bool:
     """Adds an employee to the database."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        with transaction() as conn:
+            conn.execute(
                 "INSERT INTO employees (telegram_id, full_name, phone_number) VALUES (?, ?, ?)",
                 (telegram_id, full_name, phone_number),
             )
-            conn.commit()
-            return True
+            invalidate_employee(telegram_id)
+        return True
     except sqlite3.IntegrityError:
         return False
+
+
+add_employee_async = writer(add_employee)
@@ -1,12 +1,22 @@
+import logging
+
 from aiogram import Router, types, F
 
-from config import ADMIN_ID
+from backup import backup_scheduler
+from database import employee_cache, release_payment_async
+from fsm_storage import fsm_storage
+from outbox import outbox
+from digest import order_digest
+from handlers.referral_utils import referral_reconciler, rebuild_referral_paths_async
+from ledger import ledger_checkpointer, get_ledger_balance_async, get_ledger_entries_async, post_adjustment_async
+from rendering import render_service
+from report_cache import report_cache
 
 router = Router()
 
 @router.message(F.text == "/admin")
-async def admin_panel(message: types.Message):
-    if message.from_user.id not in ADMIN_ID:
+async def admin_panel(message: types.Message, is_admin: bool):
+    if not is_admin:
         await message.answer("🚫 You are not authorized to access the admin panel.")
         return
 
@@ -17,8 +27,194 @@ async def admin_panel(message: types.Message):
         "📦 /orders → View orders\n"
         "📝 /update_order <order_id> <status>\n"
         "💰 /commissions → View commissions\n"
+        "📥 /import\\_users → Bulk add employees from a CSV file\n"
+        "💾 /backup\\_status → Google Drive backup lag\n"
+        "🧠 /cache\\_stats → Employee cache hit rate\n"
+        "🔁 /reconcile\\_referrals \\[rebuild] → Check and fix referral counters\n"
+        "🏆 /top\\_sellers \\[days=N] \\[top=N] → Best sellers\n"
+        "📦 /top\\_products \\[days=N] \\[top=N] → Best-selling products\n"
+        "🗺 /wilaya\\_heatmap \\[days=N] → Orders per wilaya\n"
+        "📒 /ledger \\[telegram\\_id] → Balance history, or checkpoint all balances\n"
+        "✍️ /ledger adjust <telegram\\_id> <amount> → Record a balance edited by hand\n"
+        "↩️ /reject\\_payment <payment\\_id> → Reject a payout and release its amount\n"
+    )
+    await message.answer(response, parse_mode="Markdown")
+
+
+@router.message(F.text == "/backup_status")
+async def backup_status(message: types.Message, is_admin: bool):
+    """Shows how far the Google Drive backup is behind the live database."""
+    if not is_admin:
+        await message.answer("🚫 You are not authorized to use this command.")
+        return
+
+    status = backup_scheduler.status()
+    response = (
+        "💾 *Backup Status*\n\n"
+        f"⏱ Lag: {status['lag_seconds']} s\n"
+        f"📝 Pending writes: {status['pending_writes']}\n"
+        f"✅ Uploads: {status['uploads']} | ❌ Failures: {status['failures']}\n"
+        f"🕒 Last upload: {status['last_upload_at'] or 'never'} ({status['last_upload_seconds'] or 0} s)\n"
     )
     await message.answer(response, parse_mode="Markdown")
 
 
+@router.message(F.text == "/cache_stats")
+async def cache_stats(message: types.Message, is_admin: bool):
+    """Shows how often employee lookups are served from memory."""
+    if not is_admin:
+        await message.answer("🚫 You are not authorized to use this command.")
+        return
+
+    stats = employee_cache.stats()
+    response = (
+        "🧠 *Employee Cache*\n\n"
+        f"🎯 Hit rate: {stats['hit_rate'] * 100:.1f}%\n"
+        f"✅ Hits: {stats['hits']} | ❌ Misses: {stats['misses']}\n"
+        f"📦 Cached: {stats['size']} | 🗑 Evictions: {stats['evictions']} | 🔄 Invalidations: {stats['invalidations']}\n"
+    )
+    render = render_service.stats()
+    response += (
+        "\n🖨 *PDF Rendering*\n\n"
+        f"✅ Done: {render['completed']} | ❌ Failed: {render['failed']} | ⏱ Avg: {render['avg_seconds']} s\n"
+        f"⏳ Queued: {render['queued']} (max {render['max_queued']}) | ⚙️ Active: {render['active']}\n"
+    )
+    forms = fsm_storage.stats()
+    response += (
+        "\n📝 *Conversations*\n\n"
+        f"🟢 Live: {forms['live']} | 🧠 In memory: {forms['in_memory']} | 💤 Spilled: {forms['spilled']}\n"
+        f"🗑 Abandoned: {forms['abandoned']} | 💾 Pending writes: {forms['pending_writes']} | 📥 Loads: {forms['loads']}\n"
+    )
+    sends = outbox.stats()
+    response += (
+        "\n📤 *Outgoing Messages*\n\n"
+        f"⏳ Queued: {sends['queued']} (max {sends['max_queued']}) | ✅ Sent: {sends['sent']} | ❌ Failed: {sends['failed']}\n"
+        f"🔁 Retries: {sends['retries']} (flood control: {sends['retry_after_hits']}) | ⏱ Avg delay: {sends['avg_latency']} s\n"
+    )
+    digest = order_digest.stats()
+    response += (
+        f"🧾 Order digest ({digest['mode']}): {digest['pending']} waiting | {digest['digests']} sent "
+        f"with {digest['digested_orders']} orders | 🚨 Urgent: {digest['urgent']}\n"
+    )
+    reports = report_cache.stats()
+    response += (
+        "\n📄 *Report Cache*\n\n"
+        f"🎯 Resent by file\\_id: {reports['hits']} | 🆕 Regenerated: {reports['misses']}\n"
+        f"📦 Cached: {reports['size']} | 🗑 Evictions: {reports['evictions']}\n"
+    )
+    await message.answer(response, parse_mode="Markdown")
+
+
+@router.message(F.text.startswith("/reconcile_referrals"))
+async def reconcile_referrals(message: types.Message, is_admin: bool):
+    """Recomputes the referral counters from the referrals table and fixes any drift.
+
+    "/reconcile_referrals rebuild" also rebuilds the referral graph (closure table) first.
+    """
+    if not is_admin:
+        await message.answer("🚫 You are not authorized to use this command.")
+        return
+
+    if "rebuild" in message.text.split()[1:]:
+        paths = await rebuild_referral_paths_async()
+        await message.answer(f"🌳 Referral graph rebuilt: {paths} paths.")
+
+    drift = await referral_reconciler.run_now()
+    if not drift:
+        await message.answer("✅ Referral counters are consistent.")
+        return
+
+    lines = [
+        f"• {telegram_id}: count {stored_count} → {actual_count}, earnings {stored_earnings} → {actual_earnings}"
+        for telegram_id, stored_count, actual_count, stored_earnings, actual_earnings in drift[:20]
+    ]
+    if len(drift) > 20:
+        lines.append(f"… and {len(drift) - 20} more")
+    await message.answer(f"🔁 Fixed referral counters for {len(drift)} employees:\n" + "\n".join(lines))
+
+
+@router.message(F.text.startswith("/ledger"))
+async def ledger_command(message: types.Message, is_admin: bool):
+    """/ledger <telegram_id> shows an employee's recent balance entries; /ledger alone checkpoints every balance.
+
+    "/ledger adjust <telegram_id> <amount>" records a balance edited outside the ledger.
+    """
+    if not is_admin:
+        await message.answer("🚫 You are not authorized to use this command.")
+        return
+
+    args = message.text.split()[1:]
+    if not args:
+        drift = await ledger_checkpointer.run_now()
+        if not drift:
+            await message.answer("✅ Ledger checkpointed, every balance matches it.")
+            return
+        lines = [
+            f"• {telegram_id}: stored {stored} DZD, ledger {actual} DZD (adjustment {stored - actual:+d})"
+            for telegram_id, stored, actual in drift[:20]
+        ]
+        if len(drift) > 20:
+            lines.append(f"… and {len(drift) - 20} more")
+        await message.answer(
+            f"📒 Ledger checkpointed, {len(drift)} balances do not match it (reported):\n" + "\n".join(lines)
+            + "\n\nRecord a hand-edited balance with /ledger adjust <telegram_id> <amount>."
+        )
+        return
+
+    if args[0] == "adjust":
+        if len(args) != 3 or not args[1].isdigit() or not args[2].lstrip("+-").isdigit():
+            await message.answer("⚠️ Usage: /ledger adjust <telegram_id> <amount>")
+            return
+        telegram_id, amount = int(args[1]), int(args[2])
+        ledger_balance = await post_adjustment_async(telegram_id, amount)
+        if ledger_balance is None:
+            await message.answer(f"❌ Adjustment refused: unknown employee or the ledger balance of {telegram_id} would go below zero.")
+            return
+        await message.answer(f"✍️ Adjustment of {amount:+d} DZD recorded for {telegram_id}, ledger balance {ledger_balance} DZD.")
+        return
+
+    if not args[0].isdigit():
+        await message.answer("⚠️ Usage: /ledger [telegram_id] or /ledger adjust <telegram_id> <amount>")
+        return
+
+    telegram_id = int(args[0])
+    ledger_balance = await get_ledger_balance_async(telegram_id)
+    if ledger_balance is None:
+        await message.answer(f"⚠️ No employee found with Telegram ID {telegram_id}.")
+        return
+
+    entries = await get_ledger_entries_async(telegram_id)
+    lines = [f"📒 Ledger of {telegram_id} — balance {ledger_balance} DZD\n"]
+    for entry_id, amount, kind, ref_id, created_at in entries:
+        reference = f" #{ref_id}" if ref_id else ""
+        lines.append(f"{created_at} {amount:+d} DZD {kind}{reference}")
+    if not entries:
+        lines.append("No entries yet.")
+    await message.answer("\n".join(lines))
+
+
+@router.message(F.text.startswith("/reject_payment"))
+async def reject_payment(message: types.Message, is_admin: bool):
+    """/reject_payment <payment_id>: rejects a payout request and gives the reserved amount back."""
+    if not is_admin:
+        await message.answer("🚫 You are not authorized to use this command.")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 1 or not args[0].isdigit():
+        await message.answer("⚠️ Usage: /reject_payment <payment_id>")
+        return
+
+    released = await release_payment_async(int(args[0]))
+    if not released:
+        await message.answer(f"⚠️ Payment #{args[0]} does not exist or was already paid or rejected.")
+        return
 
+    telegram_id, amount, balance = released
+    await message.answer(f"↩️ Payment #{args[0]} rejected, {amount} DZD released to {telegram_id} (balance {balance} DZD).")
+    try:
+        await message.bot.send_message(
+            telegram_id, f"❌ Your payment request of {amount} DZD was rejected. The amount is back in your balance ({balance} DZD)."
+        )
+    except Exception as e:
+        logging.warning(f"⚠️ Could not notify {telegram_id} of the rejected payment: {e}")
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Router, types, F
+
+from database import get_db_connection
+from async_db import reader
+
+router = Router()
+
+USAGE = "⚠️ Usage: {command} [days=N] [top=N]   (days=0 → all time)"
+
+DEFAULT_DAYS = 30
+DEFAULT_TOP = 10
+MAX_TOP = 50
+HEATMAP_WIDTH = 12  # Characters of the longest bar
+
+
+@router.message(F.text.startswith("/top_sellers"))
+async def top_sellers_command(message: types.Message, is_admin: bool):
+    """Handles /top_sellers: employees ranked by number of orders."""
+    options = await parse_options(message, is_admin)
+    if not options:
+        return
+
+    rows = await get_top_sellers_async(since(options["days"]), options["top"])
+    if not rows:
+        await message.reply("📭 No orders in this period.")
+        return
+
+    lines = [f"🏆 Top sellers — {period(options['days'])}\n"]
+    for rank, (full_name, telegram_id, orders, quantity, pending) in enumerate(rows, start=1):
+        name = full_name or "removed employee"
+        lines.append(f"{rank}. {name} ({telegram_id or '—'}): {orders} orders, {quantity} items, {pending} pending")
+    await message.reply("\n".join(lines))
+
+
+@router.message(F.text.startswith("/top_products"))
+async def top_products_command(message: types.Message, is_admin: bool):
+    """Handles /top_products: products ranked by quantity ordered."""
+    options = await parse_options(message, is_admin)
+    if not options:
+        return
+
+    rows = await get_top_products_async(since(options["days"]), options["top"])
+    if not rows:
+        await message.reply("📭 No orders in this period.")
+        return
+
+    lines = [f"📦 Top products — {period(options['days'])}\n"]
+    for rank, (product_code, product_name, orders, quantity) in enumerate(rows, start=1):
+        lines.append(f"{rank}. {product_name} ({product_code}): {quantity} items in {orders} orders")
+    await message.reply("\n".join(lines))
+
+
+@router.message(F.text.startswith("/wilaya_heatmap"))
+async def wilaya_heatmap_command(message: types.Message, is_admin: bool):
+    """Handles /wilaya_heatmap: orders per wilaya, busiest first, with a bar per wilaya."""
+    options = await parse_options(message, is_admin, top=None)
+    if not options:
+        return
+
+    rows = await get_wilaya_totals_async(since(options["days"]))
+    if not rows:
+        await message.reply("📭 No orders in this period.")
+        return
+
+    busiest = rows[0][1]
+    total = sum(orders for _, orders, _ in rows)
+    lines = [f"🗺 Orders by wilaya — {period(options['days'])} ({total} orders)\n"]
+    for wilaya, orders, quantity in rows:
+        bar = "█" * max(1, round(HEATMAP_WIDTH * orders / busiest))
+        lines.append(f"{bar} {wilaya}: {orders} ({orders * 100 / total:.0f}%)")
+
+    # Long wilaya lists are split to stay under Telegram's message size limit
+    chunk = []
+    for line in lines:
+        if sum(len(part) + 1 for part in chunk) + len(line) > 4000:
+            await message.reply("\n".join(chunk))
+            chunk = []
+        chunk.append(line)
+    await message.reply("\n".join(chunk))
+
+
+async def parse_options(message, is_admin, top=DEFAULT_TOP):
+    """Checks the caller is an admin and parses "days=N top=N". Returns None after replying on error."""
+    if not is_admin:
+        await message.reply("⛔ You are not authorized to use this command.")
+        return None
+
+    command = message.text.split()[0]
+    options = {"days": DEFAULT_DAYS, "top": top}
+    try:
+        for arg in message.text.split()[1:]:
+            key, _, value = arg.partition("=")
+            if key not in options or options[key] is None or int(value) < 0:
+                raise ValueError(f"unknown option {key}")
+            options[key] = int(value)
+    except ValueError:
+        await message.reply(USAGE.format(command=command) if top else f"⚠️ Usage: {command} [days=N]   (days=0 → all time)")
+        return None
+
+    if options["top"] is not None:
+        options["top"] = min(max(options["top"], 1), MAX_TOP)
+    return options
+
+
+def since(days):
+    """First day (UTC, like orders.created_at) of a window of `days` days ending today; None for all time."""
+    if not days:
+        return None
+    return (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+
+
+def period(days):
+    return f"last {days} days" if days else "all time"
+
+
+# Reports read the rollup tables maintained by triggers on orders (migrations/008_sales_rollups.sql),
+# so their cost depends on the days and rows in the window, not on the size of the orders table.
+
+def get_top_sellers(since_day, limit):
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT e.full_name, e.telegram_id, s.orders, s.quantity, s.pending
+            FROM (
+                SELECT employee_id, SUM(orders) AS orders, SUM(quantity) AS quantity,
+                       SUM(CASE WHEN status = 'Pending' THEN orders ELSE 0 END) AS pending
+                FROM sales_by_employee WHERE day >= COALESCE(?, '')
+                GROUP BY employee_id
+                ORDER BY orders DESC, quantity DESC LIMIT ?
+            ) s
+            LEFT JOIN employees e ON e.id = s.employee_id
+            ORDER BY s.orders DESC, s.quantity DESC
+        """, (since_day, limit)).fetchall()
+
+
+def get_top_products(since_day, limit):
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT product_code, MAX(product_name), SUM(orders), SUM(quantity) AS quantity
+            FROM sales_by_product WHERE day >= COALESCE(?, '')
+            GROUP BY product_code
+            ORDER BY quantity DESC LIMIT ?
+        """, (since_day, limit)).fetchall()
+
+
+def get_wilaya_totals(since_day):
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT wilaya, SUM(orders) AS orders, SUM(quantity)
+            FROM sales_by_wilaya WHERE day >= COALESCE(?, '')
+            GROUP BY wilaya
+            ORDER BY orders DESC
+        """, (since_day,)).fetchall()
+
+
+get_top_sellers_async = reader(get_top_sellers)
+get_top_products_async = reader(get_top_products)
+get_wilaya_totals_async = reader(get_wilaya_totals)
@@ -1,13 +1,12 @@
 from aiogram import types, F, Router
-from database import get_employee_earnings  # Function to fetch earnings
 
 # Create a router instance
 router = Router()
 
 @router.message(F.text == "/earnings")
-async def earnings(message: types.Message):
-    user_id = message.from_user.id
-    earnings_data = get_employee_earnings(user_id)
+async def earnings(message: types.Message, employee: dict | None):
+    # ✅ Employee row is resolved (and cached) by IdentityMiddleware
+    earnings_data = (employee["earnings"], employee["balance"]) if employee else None
 
     if earnings_data:
         total_earnings, available_balance = earnings_data
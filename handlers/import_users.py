@@ -0,0 +1,183 @@
+import asyncio
+import csv
+import io
+import itertools
+import re
+import sqlite3
+
+from aiogram import Router, types, F
+
+from config import IMPORT_MAX_BYTES
+from database import transaction, after_commit, employee_cache
+from async_db import writer
+
+router = Router()
+
+USAGE = (
+    "⚠️ Usage: send a CSV file with the caption /import_users\n"
+    "Columns: telegram_id, full_name, phone_number (phone as +213XXXXXXXXX or 0XXXXXXXXX)"
+)
+
+# Header names accepted for each column
+COLUMNS = {
+    "telegram_id": "telegram_id", "telegram id": "telegram_id", "id": "telegram_id",
+    "full_name": "full_name", "full name": "full_name", "name": "full_name",
+    "phone_number": "phone_number", "phone number": "phone_number", "phone": "phone_number",
+}
+
+# Algerian mobile numbers: +213 / 00213 / 0 followed by 5, 6 or 7 and eight digits
+PHONE_RE = re.compile(r"^(?:\+213|00213|0)([5-7]\d{8})$")
+
+
+@router.message(F.caption.startswith("/import_users") | F.text.startswith("/import_users"))
+async def import_users_command(message: types.Message, is_admin: bool):
+    """Handles /import_users: upserts every employee of an uploaded CSV in one transaction."""
+    if not is_admin:
+        await message.reply("⛔ You are not authorized to use this command.")
+        return
+
+    # The CSV is either attached to the command or the message it replies to
+    document = message.document or (message.reply_to_message and message.reply_to_message.document)
+    if not document:
+        await message.reply(USAGE)
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await message.reply(f"⚠️ File too large (max {IMPORT_MAX_BYTES // (1024 * 1024)} MB).")
+        return
+
+    # Parsed in a worker thread while it downloads: only one chunk of the file is held at a time
+    file = await message.bot.get_file(document.file_id)
+    chunks = message.bot.session.stream_content(url=message.bot.session.api.file_url(message.bot.token, file.file_path))
+    stream = DownloadStream(chunks, asyncio.get_running_loop(), IMPORT_MAX_BYTES)
+    try:
+        rows, rejected = await asyncio.to_thread(
+            parse_employee_csv, io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8-sig", newline="")
+        )
+    except UploadTooLarge:
+        await message.reply(f"⚠️ File too large (max {IMPORT_MAX_BYTES // (1024 * 1024)} MB).")
+        return
+    except (UnicodeDecodeError, csv.Error) as e:
+        await message.reply(f"❌ Could not read the CSV file: {e}")
+        return
+    finally:
+        await chunks.aclose()
+
+    inserted = updated = 0
+    if rows:
+        try:
+            inserted, updated = await import_employees_async(rows)
+        except sqlite3.Error as e:
+            await message.reply(f"❌ Import failed, nothing was saved: {e}")
+            return
+
+    response = (
+        "📥 Import finished\n\n"
+        f"✅ Inserted: {inserted}\n"
+        f"🔄 Updated: {updated}\n"
+        f"❌ Rejected: {len(rejected)}\n"
+    )
+    if rejected:
+        response += "\n" + "\n".join(f"• line {line}: {reason}" for line, reason in rejected[:10])
+        if len(rejected) > 10:
+            response += f"\n… and {len(rejected) - 10} more"
+    await message.reply(response)  # Plain text: rejection reasons quote raw CSV cells
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class DownloadStream(io.RawIOBase):
+    """Readable file over an async chunk iterator, read from a worker thread.
+
+    Each read pulls the next chunk from the event loop, so the download runs
+    only as fast as the parser consumes it. Raises UploadTooLarge once more
+    than `max_bytes` have arrived.
+    """
+
+    def __init__(self, chunks, loop, max_bytes):
+        self._chunks = chunks
+        self._loop = loop
+        self._max_bytes = max_bytes
+        self._buffer = b""
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    async def _next_chunk(self):
+        return await self._chunks.__anext__()
+
+    def readinto(self, buffer):
+        if not self._buffer:
+            try:
+                self._buffer = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            except StopAsyncIteration:
+                return 0
+            self.size += len(self._buffer)
+            if self.size > self._max_bytes:
+                raise UploadTooLarge(self.size)
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+
+def parse_employee_csv(text_stream):
+    """Validates CSV rows one at a time. Returns ([(telegram_id, full_name, phone)], [(line, reason)])."""
+    sample = text_stream.read(4096)
+    sample += text_stream.readline()  # End the sample on a whole line; the stream cannot seek back
+    dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+    reader = csv.reader(itertools.chain(io.StringIO(sample, newline=""), text_stream), dialect)
+
+    order = ["telegram_id", "full_name", "phone_number"]
+    rows, rejected, seen = [], [], set()
+    for line, record in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in record):
+            continue
+        if line == 1 and not record[0].strip().lstrip("+").isdigit():
+            # Header row: map the columns by name
+            order = [COLUMNS.get(cell.strip().lower()) for cell in record]
+            if not {"telegram_id", "full_name", "phone_number"} <= set(order):
+                raise csv.Error("header must name telegram_id, full_name and phone_number")
+            continue
+
+        values = {column: cell.strip() for column, cell in zip(order, record) if column}
+        telegram_id = values.get("telegram_id", "")
+        full_name = values.get("full_name", "")
+        phone = re.sub(r"[\s.\-()]", "", values.get("phone_number", ""))
+
+        if not telegram_id.isdigit():
+            rejected.append((line, f"telegram_id '{telegram_id}' is not numeric"))
+        elif not full_name:
+            rejected.append((line, "full_name is empty"))
+        elif not PHONE_RE.match(phone):
+            rejected.append((line, f"phone '{values.get('phone_number', '')}' is not a +213 mobile number"))
+        elif int(telegram_id) in seen:
+            rejected.append((line, f"telegram_id {telegram_id} appears twice"))
+        else:
+            seen.add(int(telegram_id))
+            rows.append((int(telegram_id), full_name, "+213" + PHONE_RE.match(phone).group(1)))
+    return rows, rejected
+
+
+def import_employees(rows):
+    """Upserts employees in a single transaction (one commit, one backup). Returns (inserted, updated)."""
+    with transaction() as conn:
+        existing = 0
+        for start in range(0, len(rows), 500):
+            chunk = [row[0] for row in rows[start:start + 500]]
+            placeholders = ", ".join("?" for _ in chunk)
+            existing += conn.execute(
+                f"SELECT COUNT(*) FROM employees WHERE telegram_id IN ({placeholders})", chunk
+            ).fetchone()[0]
+
+        conn.executemany("""
+            INSERT INTO employees (telegram_id, full_name, phone_number) VALUES (?, ?, ?)
+            ON CONFLICT (telegram_id) DO UPDATE SET full_name = excluded.full_name, phone_number = excluded.phone_number
+        """, rows)
+        after_commit(employee_cache.clear)
+    return len(rows) - existing, existing
+
+
+import_employees_async = writer(import_employees)
@@ -1,76 +1,124 @@
+import logging
 import sqlite3
+from datetime import datetime
+
 from aiogram import Router, types, F
-from aiogram.types import FSInputFile
-from fpdf import FPDF
-import os
+from aiogram.types import BufferedInputFile
 
-from database import get_db_connection
-from config import ADMIN_ID
+from config import EMPLOYEE_REPORT_CHUNK, EMPLOYEE_REPORT_PART_ROWS, EMPLOYEE_REPORT_PART_BYTES, EMPLOYEE_REPORT_ROW_BYTES
+from database import get_db_connection, get_table_versions_async
+from async_db import reader
+from pdf_reports import render_employee_list
+from rendering import render_service
+from report_cache import report_cache
 
 router = Router()
 
-@router.message(F.text == "/list_users")
-async def list_users_command(message: types.Message):
-    """Handles /list_users command for admin to generate a PDF report of all employees."""
-    if message.from_user.id not in ADMIN_ID:
+USAGE = "⚠️ Usage: /list_users [joined_after=YYYY-MM-DD] [min_balance=N]"
+
+# Rows per PDF part, small enough that a part always fits under the byte limit
+PART_ROWS = max(1, min(EMPLOYEE_REPORT_PART_ROWS, EMPLOYEE_REPORT_PART_BYTES // EMPLOYEE_REPORT_ROW_BYTES))
+
+
+@router.message(F.text.startswith("/list_users"))
+async def list_users_command(message: types.Message, is_admin: bool):
+    """Handles /list_users command for admin to generate a PDF report of all employees.
+
+    The roster is read in keyset chunks and sent as one or more PDF parts of
+    PART_ROWS rows, each rendered once, so memory stays bounded by a single
+    part however many employees there are.
+    """
+    if not is_admin:
         await message.reply("⛔ You are not authorized to use this command.")
         return
 
-    employees = get_all_employees()
+    try:
+        filters = parse_filters(message.text)
+    except ValueError:
+        await message.reply(USAGE)
+        return
+
+    # Unchanged since the last report? Resend the same files by their Telegram file_ids
+    report = "employee_list" + "".join(f":{key}={value}" for key, value in sorted(filters.items()))
+    version = await get_table_versions_async("employees")
+    if await report_cache.resend(report, version, message.reply_document):
+        return
 
-    if not employees:
+    sent = []
+    rows = []
+    after_id = 0
+    while True:
+        chunk = await get_employees_chunk_async(after_id, EMPLOYEE_REPORT_CHUNK, **filters)
+        if not chunk:
+            break
+        after_id = chunk[-1][0]
+        rows.extend(chunk)
+        # Roll over only once we know more rows follow, so the last part is labelled correctly
+        while len(rows) > PART_ROWS:
+            await send_part(message, rows[:PART_ROWS], sent, multipart=True)
+            rows = rows[PART_ROWS:]
+
+    if rows:
+        await send_part(message, rows, sent, multipart=bool(sent))
+
+    if not sent:
         await message.reply("ℹ️ No employees found.")
         return
 
-    pdf_path = generate_pdf(employees)
+    report_cache.remember(report, version, *sent)
+
+
+async def send_part(message, rows, sent, multipart):
+    """Renders and sends one part."""
+    part = len(sent) + 1 if multipart else None
+    pdf_bytes = await render_service.render(render_employee_list, rows, part)
+    if len(pdf_bytes) > EMPLOYEE_REPORT_PART_BYTES:
+        logging.warning(f"⚠️ Employee list part of {len(rows)} rows is {len(pdf_bytes)} bytes; lower EMPLOYEE_REPORT_PART_ROWS or raise EMPLOYEE_REPORT_ROW_BYTES")
 
-    # Send the PDF file
-    pdf_file = FSInputFile(pdf_path)
-    await message.reply_document(pdf_file, caption="📄 Employee List Report")
+    if part:
+        pdf_file = BufferedInputFile(pdf_bytes, filename=f"employee_list_part{part}.pdf")
+        caption = f"📄 Employee List Report (part {part})"
+    else:
+        pdf_file = BufferedInputFile(pdf_bytes, filename="employee_list.pdf")
+        caption = "📄 Employee List Report"
+    sent.append(await message.reply_document(pdf_file, caption=caption))
 
-    # Delete the PDF after sending
-    os.remove(pdf_path)
 
-def get_all_employees():
-    """Fetches all employees from the database."""
+def parse_filters(text):
+    """Parses "/list_users joined_after=2024-01-31 min_balance=100" into keyword filters."""
+    filters = {}
+    for arg in text.split()[1:]:
+        key, _, value = arg.partition("=")
+        if key == "joined_after":
+            filters[key] = datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+        elif key == "min_balance":
+            filters[key] = int(value)
+        else:
+            raise ValueError(f"unknown filter {key}")
+    return filters
+
+
+def get_employees_chunk(after_id, limit, joined_after=None, min_balance=None):
+    """Fetches the next `limit` employees with id > after_id, optionally filtered."""
+    conditions, params = ["id > ?"], [after_id]
+    if joined_after:
+        conditions.append("date_joined >= ?")
+        params.append(joined_after)
+    if min_balance is not None:
+        conditions.append("balance >= ?")
+        params.append(min_balance)
+    params.append(limit)
+
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, telegram_id, full_name, phone_number, invited_by, balance, earnings, date_joined, invite_count 
-                FROM employees
-            """)
+            cursor.execute(f"""
+                SELECT id, telegram_id, full_name, phone_number, invited_by, balance, earnings, date_joined, invite_count
+                FROM employees WHERE {" AND ".join(conditions)} ORDER BY id LIMIT ?
+            """, params)
             return cursor.fetchall()
     except sqlite3.Error:
         return []
 
-def generate_pdf(employees):
-    """Generates a PDF file with employee details in a table format."""
-    pdf = FPDF(orientation="L", unit="mm", format="A4")  # Landscape mode for better spacing
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(280, 10, "Employee List Report", ln=True, align="C")
-    pdf.ln(10)
-
-    # Table Header
-    pdf.set_font("Arial", "B", 9)
-    headers = ["ID", "Telegram ID", "Full Name", "Phone", "Invited By", "Balance", "Earnings", "Date Joined", "Invites"]
-    col_widths = [10, 30, 50, 25, 30, 25, 25, 35, 15]  # Adjusted column widths
-
-    for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], 10, header, 1, 0, "C")
-    pdf.ln()
-
-    # Table Rows
-    pdf.set_font("Arial", "", 9)
-    for emp in employees:
-        for i, data in enumerate(emp):
-            pdf.cell(col_widths[i], 10, str(data), 1, 0, "C")
-        pdf.ln()
-
-    # Save PDF file
-    pdf_filename = "employee_list.pdf"
-    pdf.output(pdf_filename)
-    return pdf_filename
+
+get_employees_chunk_async = reader(get_employees_chunk)
@@ -1,22 +1,16 @@
-import os
-from datetime import datetime
+import logging
 
 from aiogram import Router, F
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.types import Message, FSInputFile
-from reportlab.lib.colors import black, gray
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from aiogram.types import Message
 
-from config import ADMIN_ID  # ✅ Import admin list
-from database import add_order, get_employee
+from database import add_order_async
+from digest import order_digest
 
 router = Router()
 
-# ✅ Ensure ADMIN_ID is correctly handled
-admin_id = ADMIN_ID[0] if isinstance(ADMIN_ID, list) else ADMIN_ID
-
 
 class OrderForm(StatesGroup):
     customer_fullname = State()
@@ -29,76 +23,162 @@ class OrderForm(StatesGroup):
     exact_address = State()
 
 
-@router.message(F.text == "/place_order")
-async def start_order(message: Message, state: FSMContext):
-    employee = get_employee(message.from_user.id)
-    if not employee:
-        await message.answer("⚠️ You are not registered! Please use /start to register first.")
+# Prompt for each field, in the order the wizard asks for them
+PROMPTS = {
+    "customer_fullname": "📝 Enter the customer's full name:",
+    "customer_phone": "📞 Enter the customer's phone number:",
+    "product_name": "📦 Enter the product name:",
+    "product_code": "🔢 Enter the product code:",
+    "quantity": "🔢 Enter the quantity:",
+    "wilaya": "📍 Enter the wilaya (state):",
+    "baladiya": "🏙 Enter the baladiya (city):",
+    "exact_address": "📌 Enter the exact address:",
+}
+
+# Keys accepted in a one-shot "key: value" order block
+FIELD_ALIASES = {
+    "name": "customer_fullname", "customer": "customer_fullname", "full name": "customer_fullname",
+    "customer name": "customer_fullname", "customer_fullname": "customer_fullname",
+    "phone": "customer_phone", "tel": "customer_phone", "customer phone": "customer_phone",
+    "customer_phone": "customer_phone",
+    "product": "product_name", "product name": "product_name", "product_name": "product_name",
+    "code": "product_code", "product code": "product_code", "product_code": "product_code",
+    "qty": "quantity", "quantity": "quantity",
+    "wilaya": "wilaya", "state": "wilaya",
+    "baladiya": "baladiya", "city": "baladiya", "commune": "baladiya",
+    "address": "exact_address", "exact address": "exact_address", "exact_address": "exact_address",
+    "urgent": "urgent", "priority": "urgent",  # Optional: skips the admin digest
+}
+
+ONE_SHOT_TIP = (
+    "💡 Tip: send the whole order at once, e.g.\n"
+    "/place_order\n"
+    "name: Karim Benali\n"
+    "phone: 0555123456\n"
+    "product: Sneakers\n"
+    "code: SN-42\n"
+    "qty: 2\n"
+    "wilaya: Alger\n"
+    "city: Bab Ezzouar\n"
+    "address: Cité 5 Juillet, Bt 12\n"
+    "urgent: yes (optional)"
+)
+
+
+def clean_field(field, value):
+    """Returns the cleaned value of one order field, or raises ValueError with a user-facing reason."""
+    value = (value or "").strip()
+    if field == "urgent":
+        return value.lower() in {"yes", "y", "true", "1", "urgent", "high"}
+    if not value:
+        raise ValueError("is missing")
+    if field == "quantity":
+        if not value.isdigit():
+            raise ValueError("must be a number")
+        return int(value)
+    return value
+
+
+def parse_order_block(text, positional=True):
+    """Parses a one-shot order: "key: value" lines, or (if positional) one field per line in wizard order.
+
+    Returns (fields, errors); fields holds the valid values, errors maps the
+    invalid fields to the reason.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    raw = {}
+    for line in lines:
+        key, separator, value = line.partition(":")
+        field = FIELD_ALIASES.get(key.strip().lower()) if separator else None
+        if field:
+            raw[field] = value
+
+    if not raw and lines and positional:
+        # No keys: one field per line, in the order the wizard asks for them
+        raw = dict(zip(PROMPTS, lines))
+        if len(lines) > len(PROMPTS):
+            raw["exact_address"] = ", ".join(lines[len(PROMPTS) - 1:])
+
+    fields, errors = {}, {}
+    for field, value in raw.items():
+        try:
+            fields[field] = clean_field(field, value)
+        except ValueError as e:
+            errors[field] = str(e)
+    return fields, errors
+
+
+def describe_errors(errors):
+    return "".join(f"⚠️ {field.replace('_', ' ')} {reason}.\n" for field, reason in errors.items())
+
+
+def next_missing_field(data):
+    """Returns the first field the order still needs, or None when it is complete."""
+    return next((field for field in PROMPTS if field not in data), None)
+
+
+async def ask_next(message: Message, state: FSMContext, employee: dict | None, notes=""):
+    """Prompts for the next missing field, or places the order once nothing is missing."""
+    data = await state.get_data()
+    field = next_missing_field(data)
+    if field is None:
+        await submit_order(message, state, data, employee)
         return
 
-    await message.answer("📝 Enter the customer's full name:")
-    await state.set_state(OrderForm.customer_fullname)
+    await state.set_state(getattr(OrderForm, field))
+    await message.answer(f"{notes}{PROMPTS[field]}")
 
 
-@router.message(OrderForm.customer_fullname)
-async def get_customer_name(message: Message, state: FSMContext):
-    await state.update_data(customer_fullname=message.text)
-    await message.answer("📞 Enter the customer's phone number:")
-    await state.set_state(OrderForm.customer_phone)
-
-
-@router.message(OrderForm.customer_phone)
-async def get_customer_phone(message: Message, state: FSMContext):
-    await state.update_data(customer_phone=message.text)
-    await message.answer("📦 Enter the product name:")
-    await state.set_state(OrderForm.product_name)
+@router.message(F.text.startswith("/place_order"))
+async def start_order(message: Message, state: FSMContext, employee: dict | None):
+    if not employee:
+        await message.answer("⚠️ You are not registered! Please use /start to register first.")
+        return
 
+    parts = message.text.split(maxsplit=1)
+    await state.clear()
+    if len(parts) < 2:
+        # Plain /place_order: step-by-step wizard
+        await state.set_state(OrderForm.customer_fullname)
+        await message.answer(f"{PROMPTS['customer_fullname']}\n\n{ONE_SHOT_TIP}")
+        return
 
-@router.message(OrderForm.product_name)
-async def get_product_name(message: Message, state: FSMContext):
-    await state.update_data(product_name=message.text)
-    await message.answer("🔢 Enter the product code:")
-    await state.set_state(OrderForm.product_code)
+    # One-shot entry: parse everything, then ask only for what is missing or invalid
+    fields, errors = parse_order_block(parts[1])
+    await state.update_data(**fields)
+    await ask_next(message, state, employee, describe_errors(errors))
 
 
-@router.message(OrderForm.product_code)
-async def get_product_code(message: Message, state: FSMContext):
-    await state.update_data(product_code=message.text)
-    await message.answer("🔢 Enter the quantity:")
-    await state.set_state(OrderForm.quantity)
+@router.message(StateFilter(OrderForm))
+async def get_order_field(message: Message, state: FSMContext, employee: dict | None):
+    """Stores the answer for the field being asked, then moves on to the next missing one."""
+    field = (await state.get_state()).split(":", 1)[1]
 
+    text = message.text or ""
+    if "\n" in text:
+        # A pasted "key: value" block fills in several fields at once
+        fields, errors = parse_order_block(text, positional=False)
+        if fields or errors:
+            await state.update_data(**fields)
+            await ask_next(message, state, employee, describe_errors(errors))
+            return
 
-@router.message(OrderForm.quantity)
-async def get_quantity(message: Message, state: FSMContext):
-    if not message.text.isdigit():
-        await message.answer("⚠️ Please enter a valid quantity (number).")
+    try:
+        value = clean_field(field, text)
+    except ValueError:
+        if field == "quantity":
+            await message.answer("⚠️ Please enter a valid quantity (number).")
+        else:
+            await message.answer(PROMPTS[field])
         return
 
-    await state.update_data(quantity=int(message.text))
-    await message.answer("📍 Enter the wilaya (state):")
-    await state.set_state(OrderForm.wilaya)
-
+    await state.update_data(**{field: value})
+    await ask_next(message, state, employee)
 
-@router.message(OrderForm.wilaya)
-async def get_wilaya(message: Message, state: FSMContext):
-    await state.update_data(wilaya=message.text)
-    await message.answer("🏙 Enter the baladiya (city):")
-    await state.set_state(OrderForm.baladiya)
 
-
-@router.message(OrderForm.baladiya)
-async def get_baladiya(message: Message, state: FSMContext):
-    await state.update_data(baladiya=message.text)
-    await message.answer("📌 Enter the exact address:")
-    await state.set_state(OrderForm.exact_address)
-
-
-@router.message(OrderForm.exact_address)
-async def get_exact_address(message: Message, state: FSMContext):
-    await state.update_data(exact_address=message.text)
-    data = await state.get_data()
+async def submit_order(message: Message, state: FSMContext, data: dict, employee: dict | None):
+    """Saves a complete order and sends its PDF to the admin."""
     employee_id = message.from_user.id
-    employee = get_employee(employee_id)
 
     if not employee:
         await message.answer("⚠️ Employee not found. Please register first.")
@@ -106,7 +186,7 @@ async def get_exact_address(message: Message, state: FSMContext):
 
     # Save Order to Database
     try:
-        order_id = add_order(
+        order_id = await add_order_async(
             employee_id,
             customer_fullname=data["customer_fullname"],
             customer_phone=data["customer_phone"],
@@ -117,79 +197,17 @@ async def get_exact_address(message: Message, state: FSMContext):
             baladiya=data["baladiya"],
             exact_address=data["exact_address"]
         )
-        await message.answer("✅ Order placed successfully! Status: Pending.")
-
-        # Generate & Send PDF
-        pdf_path = generate_order_pdf(order_id, data, employee)
-        pdf_file = FSInputFile(pdf_path)
-
-        # ✅ Send the order to the first admin
-        await message.bot.send_document(chat_id=admin_id, document=pdf_file, caption="📄 New Order Received")
-
-        # Cleanup
-        os.remove(pdf_path)
-    except Exception as e:
+    except Exception:
+        logging.exception("❌ Error placing order")
         await message.answer("❌ Error placing order. Please try again.")
-        print(f"Error placing order: {e}")
+        await state.clear()
+        return
 
+    await message.answer("✅ Order placed successfully! Status: Pending.")
     await state.clear()
 
-
-
-
-
-def generate_order_pdf(order_id, data, employee):
-    """Generates a visually improved PDF for the order and returns the file path."""
-    pdf_path = f"order_{order_id}.pdf"
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-
-    # Colors & Styling
-    c.setFillColor(black)
-
-    # **Header Section**
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(200, 820, "🛍 Bazar Order Confirmation")
-    c.setFont("Helvetica", 12)
-    c.setFillColor(gray)
-    c.drawString(200, 800, f"Order ID: {order_id}  |  Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    c.setFillColor(black)
-
-    # **Employee Details**
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, 770, "👨‍💼 Employee Details")
-    c.setFont("Helvetica", 12)
-    c.drawString(70, 750, f"🆔 ID: {employee['id']}")
-    c.drawString(70, 730, f"👤 Name: {employee['full_name']}")
-    c.drawString(70, 710, f"📞 Phone: {employee['phone_number']}")
-    c.drawString(70, 690, f"💬 Telegram: {employee['telegram_id']}")
-
-    # **Customer & Order Details**
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, 660, "📦 Order Details")
-    c.setFont("Helvetica", 12)
-    c.drawString(70, 640, f"👤 Customer: {data['customer_fullname']} ({data['customer_phone']})")
-    c.drawString(70, 620, f"📦 Product: {data['product_name']} (Code: {data['product_code']})")
-    c.drawString(70, 600, f"🔢 Quantity: {data['quantity']}")
-
-    # **Address Section**
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, 570, "📍 Shipping Address")
-    c.setFont("Helvetica", 12)
-    c.drawString(70, 550, f"🏙 Wilaya: {data['wilaya']}")
-    c.drawString(70, 530, f"🏠 Baladiya: {data['baladiya']}")
-    c.drawString(70, 510, f"📌 Exact Address: {data['exact_address']}")
-
-    # **Status Section**
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, 480, "🔹 Order Status")
-    c.setFont("Helvetica", 12)
-    c.drawString(70, 460, "🟡 Pending")
-
-    # **Footer (Signature or Notes)**
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, 420, "📜 Notes:")
-    c.setFont("Helvetica-Oblique", 12)
-    c.drawString(70, 400, "⚠ Please confirm the order details before processing.")
-
-    c.save()
-    return pdf_path
+    # ✅ Tell the admins: batched into the next digest, or right away if urgent. The order is saved either way.
+    try:
+        await order_digest.notify(message.bot, order_id, data, employee)
+    except Exception:
+        logging.exception(f"❌ Could not notify the admins of order {order_id}")
@@ -1,94 +1,95 @@
+from contextlib import suppress
+
 from aiogram import Router, F
-from aiogram.types import Message, FSInputFile
-from fpdf import FPDF
-import os
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from database import get_employee_orders, get_employee
+from database import get_employee_orders_async, get_employee_orders_page_async
+from pdf_reports import render_order_history
+from rendering import render_service
 
 router = Router()
 
-class OrderPDF(FPDF):
-    def header(self):
-        """Custom header with logo and title"""
-        logo_path = "bazar1.jpg"  # Ensure this file exists
-
-        # Add logo if available
-        if os.path.exists(logo_path):
-            self.image(logo_path, x=10, y=5, w=50)  # x=10 (left), y=5 (higher), w=50 (bigger)
-        # Adjust size & position
-
-        # Title
-        self.set_font("Arial", "B", 18)
-        self.cell(200, 10, "Order History", ln=True, align="C")
-        self.ln(15)  # Space after title
-
-    def footer(self):
-        """Custom footer with a message"""
-        self.set_y(-15)
-        self.set_font("Arial", "I", 10)
-        self.cell(0, 10, "Thank you for using BazarBot!", align="C")
-
-def generate_orders_pdf(employee_telegram_id, orders):
-    pdf = OrderPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    # Table Header
-    pdf.set_fill_color(50, 50, 50)  # Dark Gray
-    pdf.set_text_color(255, 255, 255)  # White
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(40, 10, "Product", 1, 0, "C", 1)
-    pdf.cell(30, 10, "Code", 1, 0, "C", 1)
-    pdf.cell(20, 10, "Qty", 1, 0, "C", 1)
-    pdf.cell(40, 10, "Location", 1, 0, "C", 1)
-    pdf.cell(40, 10, "Status", 1, 1, "C", 1)
-
-    # Reset text color
-    pdf.set_text_color(0, 0, 0)
-
-    # Table Data
-    pdf.set_font("Arial", size=11)
-    for product_name, product_code, quantity, wilaya, baladiya, status in orders:
-        pdf.cell(40, 10, product_name, 1)
-        pdf.cell(30, 10, product_code, 1)
-        pdf.cell(20, 10, str(quantity), 1, 0, "C")
-        pdf.cell(40, 10, f"{wilaya}, {baladiya}", 1)
-        pdf.cell(40, 10, status, 1, 1, "C")
-
-    # Save the file
-    filename = f"orders_{employee_telegram_id}.pdf"
-    pdf.output(filename, "F")  # "F" ensures file mode write
-    return filename
 
-@router.message(F.text == "/orders")
-async def show_orders(message: Message):
-    print(f"DEBUG: /orders triggered by {message.from_user.id}")
+class OrdersPage(CallbackData, prefix="orders"):
+    """Inline button payload: action is "older", "newer" or "pdf"; cursor is an order id."""
+    action: str
+    cursor: int = 0
+
+
+def format_orders_page(rows, has_older, has_newer):
+    """Builds the text and inline keyboard for one page of order history."""
+    lines = ["📦 Your orders (newest first)"]
+    for order_id, product_name, product_code, quantity, wilaya, baladiya, status in rows:
+        lines.append(f"#{order_id} • {product_name} ({product_code}) × {quantity}\n📍 {wilaya}, {baladiya} — {status}")
+
+    keyboard = InlineKeyboardBuilder()
+    if has_newer:
+        keyboard.button(text="⬅️ Newer", callback_data=OrdersPage(action="newer", cursor=rows[0][0]))
+    if has_older:
+        keyboard.button(text="Older ➡️", callback_data=OrdersPage(action="older", cursor=rows[-1][0]))
+    keyboard.button(text="📄 Export PDF", callback_data=OrdersPage(action="pdf"))
+    keyboard.adjust(2 if has_newer and has_older else 1, 1)
+    return "\n\n".join(lines), keyboard.as_markup()
+
 
-    employee = get_employee(message.from_user.id)
+@router.message(F.text == "/orders")
+async def show_orders(message: Message, employee: dict | None):
     if not employee:
         await message.answer("⚠️ You are not registered! Please use /start to register first.")
         return
 
-    orders = get_employee_orders(message.from_user.id)
-    if not orders:
+    rows, has_older, has_newer = await get_employee_orders_page_async(employee["id"])
+    if not rows:
         await message.answer("📭 No orders found in your history.")
         return
 
-    pdf_filename = None  # Fix: Declare pdf_filename before try
+    text, keyboard = format_orders_page(rows, has_older, has_newer)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(OrdersPage.filter(F.action.in_({"older", "newer"})))
+async def turn_orders_page(callback: CallbackQuery, callback_data: OrdersPage, employee: dict | None):
+    """Edits the history message in place with the next or previous page."""
+    if not employee:
+        await callback.answer("⚠️ You are not registered! Please use /start to register first.", show_alert=True)
+        return
+
+    if callback_data.action == "older":
+        page = await get_employee_orders_page_async(employee["id"], before_id=callback_data.cursor)
+    else:
+        page = await get_employee_orders_page_async(employee["id"], after_id=callback_data.cursor)
+    if not page[0]:  # Orders vanished under the cursor; start over from the newest
+        page = await get_employee_orders_page_async(employee["id"])
+
+    text, keyboard = format_orders_page(*page)
+    with suppress(TelegramBadRequest):  # "message is not modified" on a double tap
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(OrdersPage.filter(F.action == "pdf"))
+async def export_orders_pdf(callback: CallbackQuery, employee: dict | None):
+    """Sends the full order history as a PDF, on request."""
+    if not employee:
+        await callback.answer("⚠️ You are not registered! Please use /start to register first.", show_alert=True)
+        return
+
+    await callback.answer("⏳ Generating your PDF...")
+    orders = await get_employee_orders_async(callback.from_user.id)
+    if not orders:
+        await callback.message.answer("📭 No orders found in your history.")
+        return
 
     try:
-        # ✅ Generate PDF
-        pdf_filename = generate_orders_pdf(message.from_user.id, orders)
+        # ✅ Generate PDF in memory, off the event loop
+        pdf_bytes = await render_service.render(render_order_history, orders)
 
         # ✅ Send PDF to employee
-        await message.answer_document(FSInputFile(pdf_filename))
+        await callback.message.answer_document(BufferedInputFile(pdf_bytes, filename=f"orders_{callback.from_user.id}.pdf"))
 
     except Exception as e:
         print(f"ERROR: Failed to send PDF - {e}")
-        await message.answer("❌ An error occurred while generating your order history.")
-
-    finally:
-        # ✅ Cleanup: Remove the file after sending
-        if pdf_filename and os.path.exists(pdf_filename):
-            os.remove(pdf_filename)
+        await callback.message.answer("❌ An error occurred while generating your order history.")
@@ -1,20 +1,17 @@
 from aiogram import Router, F
 from aiogram.types import Message
-from database import get_employee
 
 router = Router()
 
 # Handle /profile command
 @router.message(F.text == "/profile")
-async def profile_command(message: Message):
-    user = get_employee(message.from_user.id)
+async def profile_command(message: Message, employee: dict | None):
+    user = employee  # ✅ Resolved once per update by IdentityMiddleware
 
     if not user:
         await message.answer("❌ You are not registered! Use /start to register.")
         return
 
-    print("DEBUG: User Data ->", user)  # Debugging Output
-
     # Ensure user is a dictionary and has required keys
     if isinstance(user, dict) and all(key in user for key in ["full_name", "phone_number", "invited_by", "balance", "earnings", "date_joined"]):
         full_name = user.get("full_name", "❌ Not Provided")
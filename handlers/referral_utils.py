@@ -1,47 +1,144 @@
-import sqlite3
+import logging
 
-def count_referrals(user_id: int):
-    """Counts the number of referrals and calculates earnings."""
-    from database import DB_PATH  # ✅ Import inside function to prevent circular import
+from async_db import reader, writer
+from config import REFERRAL_RECONCILE_INTERVAL, REFERRAL_LEVEL_REWARDS
+from jobs import PeriodicJob
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+REFERRAL_REWARD = REFERRAL_LEVEL_REWARDS[0]  # DZD credited to the direct referrer for each new employee they invite
 
-    # Get the number of referrals
-    cursor.execute("SELECT COUNT(*) FROM referrals WHERE referrer_id = ?", (user_id,))
-    result = cursor.fetchone()
-    referral_count = result[0] if result else 0
 
-    # Get earnings
-    cursor.execute("SELECT earnings FROM employees WHERE telegram_id = ?", (user_id,))
-    result = cursor.fetchone()
-    earnings = result[0] if result else 0
+def add_referral(referrer_id: int, referred_id: int):
+    """Adds a referral and pays commissions to the whole upline only if the referral is new.
 
-    conn.close()
-    return referral_count, earnings
+    Both arguments are Telegram IDs. Runs inside the caller's transaction when
+    there is one (e.g. add_employee), so the rewards are never half-applied.
+    Triggers extend the referral_paths closure table, bump the referrer's
+    invite_count and credit each commission (migrations/009_referral_paths.sql).
+    """
+    from database import transaction, invalidate_employee  # ✅ Import inside function
 
-def add_referral(referrer_id: int, referred_id: int):
-    """Adds a referral and updates earnings only if the referral is new."""
-    from database import get_db_connection  # ✅ Import inside function
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id FROM employees WHERE telegram_id = ?", (referrer_id,))
+        referrer = cursor.fetchone()
+        cursor.execute("SELECT id FROM employees WHERE telegram_id = ?", (referred_id,))
+        referred = cursor.fetchone()
+        if not referrer or not referred:
+            logging.warning(f"⚠️ Referral skipped: {referrer_id} or {referred_id} is not registered.")
+            return False
 
-    conn = get_db_connection()  # ✅ Use shared connection
-    cursor = conn.cursor()
+        # The referrer must not already be in the referred employee's downline (or be them)
+        cursor.execute(
+            "SELECT 1 FROM referral_paths WHERE ancestor_id = ? AND descendant_id = ?", (referred[0], referrer[0])
+        )
+        if referrer[0] == referred[0] or cursor.fetchone():
+            logging.warning(f"⚠️ Referral skipped: {referrer_id} is in the downline of {referred_id}.")
+            return False
 
-    try:
-        cursor.execute("INSERT OR IGNORE INTO referrals (referrer_id, referred_id) VALUES (?, ?)", (referrer_id, referred_id))
+        cursor.execute(
+            "INSERT OR IGNORE INTO referrals (referrer_id, referred_id, reward) VALUES (?, ?, ?)",
+            (referrer[0], referred[0], REFERRAL_REWARD)
+        )
 
         if cursor.rowcount == 0:
-            print(f"⚠️ Referral already exists: {referred_id} was referred before. Skipping earnings update.")
-            return
+            logging.warning(f"⚠️ Referral already exists: {referred_id} was referred before. Skipping earnings update.")
+            return False
+
+        # One set-based statement pays every upline level that has a reward
+        levels = ", ".join("(?, ?)" for _ in REFERRAL_LEVEL_REWARDS)
+        cursor.execute(f"""
+            WITH levels (depth, amount) AS (VALUES {levels})
+            INSERT OR IGNORE INTO referral_commissions (beneficiary_id, referred_id, depth, amount)
+            SELECT p.ancestor_id, p.descendant_id, p.depth, l.amount
+            FROM referral_paths p JOIN levels l ON l.depth = p.depth
+            WHERE p.descendant_id = ? AND l.amount > 0
+        """, [value for level in enumerate(REFERRAL_LEVEL_REWARDS, start=1) for value in level] + [referred[0]])
+        paid = cursor.execute("SELECT changes()").fetchone()[0]  # rowcount is -1 for statements starting with WITH
+
+        cursor.execute("""
+            SELECT e.telegram_id FROM referral_paths p JOIN employees e ON e.id = p.ancestor_id
+            WHERE p.descendant_id = ? AND p.depth <= ?
+        """, (referred[0], len(REFERRAL_LEVEL_REWARDS)))
+        for (upline_id,) in cursor.fetchall():
+            invalidate_employee(upline_id)
+
+    logging.info(f"✅ Referrer {referrer_id} earned {REFERRAL_REWARD} DZD! ({paid} upline commissions paid)")
+    logging.info(f"✅ Referral Added: {referrer_id} referred {referred_id}")
+    return True
+
+
+def get_downline(user_id: int):
+    """Returns [(depth, members, commissions earned)] for the whole downline of an employee, level by level."""
+    from database import get_db_connection  # ✅ Import inside function to prevent circular import
+
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT p.depth, COUNT(*), COALESCE(SUM(c.amount), 0)
+            FROM employees e
+            JOIN referral_paths p ON p.ancestor_id = e.id
+            LEFT JOIN referral_commissions c ON c.beneficiary_id = p.ancestor_id AND c.referred_id = p.descendant_id
+            WHERE e.telegram_id = ?
+            GROUP BY p.depth ORDER BY p.depth
+        """, (user_id,)).fetchall()
+
+
+def rebuild_referral_paths():
+    """Recomputes the referral_paths closure table from the referrals table in one pass. Returns the row count."""
+    from database import transaction  # ✅ Import inside function
+
+    with transaction() as conn:
+        conn.execute("DELETE FROM referral_paths")
+        conn.execute("""
+            INSERT INTO referral_paths (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+                SELECT referrer_id, referred_id, 1 FROM referrals
+                UNION ALL
+                SELECT p.ancestor_id, r.referred_id, p.depth + 1
+                FROM paths p JOIN referrals r ON r.referrer_id = p.descendant_id
+                WHERE p.depth < 1000
+            )
+            SELECT ancestor_id, descendant_id, MIN(depth) FROM paths GROUP BY ancestor_id, descendant_id
+        """)
+        count = conn.execute("SELECT COUNT(*) FROM referral_paths").fetchone()[0]
+    logging.info(f"🌳 Rebuilt referral graph: {count} paths")
+    return count
+
+
+def reconcile_referral_counters(fix=True):
+    """Recomputes every referrer's counters from the referrals and referral_commissions tables in one pass.
+
+    Returns [(telegram_id, stored_count, actual_count, stored_earnings, actual_earnings)]
+    for the employees that had drifted; with fix=True they are corrected in the same transaction.
+    """
+    from database import transaction, after_commit, employee_cache  # ✅ Import inside function
+
+    with transaction() as conn:
+        drift = conn.execute("""
+            SELECT e.telegram_id, e.invite_count, COALESCE(r.referrals, 0), e.referral_earnings, COALESCE(c.rewards, 0)
+            FROM employees e
+            LEFT JOIN (SELECT referrer_id, COUNT(*) AS referrals FROM referrals GROUP BY referrer_id) r
+                ON r.referrer_id = e.id
+            LEFT JOIN (SELECT beneficiary_id, SUM(amount) AS rewards FROM referral_commissions GROUP BY beneficiary_id) c
+                ON c.beneficiary_id = e.id
+            WHERE e.invite_count != COALESCE(r.referrals, 0) OR e.referral_earnings != COALESCE(c.rewards, 0)
+        """).fetchall()
+
+        if drift and fix:
+            conn.executemany(
+                "UPDATE employees SET invite_count = ?, referral_earnings = ? WHERE telegram_id = ?",
+                [(actual_count, actual_earnings, telegram_id) for telegram_id, _, actual_count, _, actual_earnings in drift]
+            )
+            after_commit(employee_cache.clear)
 
-        cursor.execute("UPDATE employees SET balance = balance + 50, earnings = earnings + 50, invite_count = invite_count + 1 WHERE telegram_id = ?", (referrer_id,))
-        conn.commit()
+    if drift:
+        logging.warning(f"⚠️ Referral counters drifted for {len(drift)} employees{' (fixed)' if fix else ''}")
+    return drift
 
-        print(f"✅ Referrer {referrer_id} earned 50 DZD!")
-        print(f"✅ Referral Added: {referrer_id} referred {referred_id}")
 
-    except sqlite3.OperationalError as e:
-        print(f"❌ Database Error: {e}")
+add_referral_async = writer(add_referral)
+get_downline_async = reader(get_downline)
+rebuild_referral_paths_async = writer(rebuild_referral_paths)
 
-    finally:
-        cursor.close()  # ✅ Close cursor only (don't close connection)
+# ✅ Periodic drift check; also runnable on demand with /reconcile_referrals
+referral_reconciler = PeriodicJob("reconcile_referrals", reconcile_referral_counters, REFERRAL_RECONCILE_INTERVAL)
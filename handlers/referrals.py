@@ -1,12 +1,35 @@
 from aiogram import types, Router, F  # ✅ Correct imports
 
+from handlers.referral_utils import get_downline_async
+
 router = Router()  # ✅ Correct way to initialize the router
 
 @router.message(F.text == "/referrals")  # ✅ Ignore commands
-async def show_referrals(message: types.Message):
-    from handlers.referral_utils import count_referrals  # ✅ Import inside function
+async def show_referrals(message: types.Message, employee: dict | None):
+    if not employee:
+        await message.answer("⚠️ You are not registered! Please use /start to register first.")
+        return
 
-    user_id = message.from_user.id
-    referral_count, earnings = count_referrals(user_id)
+    # ✅ Counters live on the employee row (kept up to date by triggers), already loaded by IdentityMiddleware
+    referral_count, earnings = employee["invite_count"], employee["referral_earnings"]
 
     await message.answer(f"📊 You have referred {referral_count} users.\n💰 Total earnings: {earnings} DZD")
+
+
+@router.message(F.text == "/downline")
+async def show_downline(message: types.Message, employee: dict | None):
+    """Shows everyone the employee brought in, directly or through their referrals, level by level."""
+    if not employee:
+        await message.answer("⚠️ You are not registered! Please use /start to register first.")
+        return
+
+    levels = await get_downline_async(message.from_user.id)
+    if not levels:
+        await message.answer("🌱 Your downline is empty. Share your Telegram ID as a referral code to grow it!")
+        return
+
+    total = sum(members for _, members, _ in levels)
+    lines = [f"🌳 Your downline: {total} employees\n"]
+    for depth, members, earned in levels:
+        lines.append(f"Level {depth}: {members} employees — 💰 {earned} DZD earned")
+    await message.answer("\n".join(lines))
@@ -1,15 +1,15 @@
 import sqlite3
 from aiogram import Router, types, F
 
-from database import get_db_connection
-from config import ADMIN_ID
+from database import transaction, invalidate_employee
+from async_db import writer
 
 router = Router()
 
 @router.message(F.text.startswith("/remove_user"))
-async def remove_user_command(message: types.Message):
+async def remove_user_command(message: types.Message, is_admin: bool):
     """Handles /remove_user command for admin to remove an employee."""
-    if message.from_user.id not in ADMIN_ID:
+    if not is_admin:
         await message.reply("⛔ You are not authorized to use this command.")
         return
 
@@ -21,7 +21,7 @@ async def remove_user_command(message: types.Message):
     try:
         telegram_id = int(args[1])
 
-        if remove_employee(telegram_id):
+        if await remove_employee_async(telegram_id):
             await message.reply(f"✅ Employee with Telegram ID {telegram_id} removed successfully!")
         else:
             await message.reply(f"⚠️ No employee found with Telegram ID {telegram_id}.")
@@ -31,13 +31,13 @@ async def remove_user_command(message: types.Message):
 def remove_employee(telegram_id: int) -> bool:
     """Removes an employee from the database."""
     try:
-        with get_db_connection() as conn:
+        with transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM employees WHERE telegram_id = ?", (telegram_id,))
-            if cursor.rowcount > 0:
-                conn.commit()
-                return True
-            else:
-                return False
+            invalidate_employee(telegram_id)
+            return cursor.rowcount > 0
     except sqlite3.Error:
         return False
+
+
+remove_employee_async = writer(remove_employee)
@@ -1,7 +1,7 @@
 from aiogram import types, F, Router
 import sqlite3
 
-from database import request_payment
+from database import request_payment_async
 
 router = Router()
 
@@ -10,13 +10,13 @@ router = Router()
 async def handle_request_payment(message: types.Message):
     telegram_id = message.from_user.id
 
-    request_status, total_balance = request_payment(telegram_id,  2000)  # Default request 2000 DZD
+    request_status, total_balance = await request_payment_async(telegram_id,  2000)  # Default request 2000 DZD
 
     if request_status:
         response = (
             "✅ *Payment Request Submitted!*\n\n"
             f"📌 Amount: *2000 DZD*\n"
-            f"💰 Your Balance: *{total_balance} DZD*\n"
+            f"💰 Remaining Balance: *{total_balance} DZD*\n"
             "🔄 Status: *Pending approval*\n\n"
             "🔔 *Admin will review your request soon.*"
         )
@@ -2,8 +2,7 @@ from aiogram import Router, F
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from database import add_employee, get_employee
-from handlers.referral_utils import add_referral
+from database import add_employee_async, get_employee_async
 
 router = Router()
 
@@ -20,8 +19,8 @@ request_phone_kb = ReplyKeyboardMarkup(
 )
 
 @router.message(F.text == "/start")
-async def start_command(message: Message, state: FSMContext):
-    user = get_employee(message.from_user.id)
+async def start_command(message: Message, state: FSMContext, employee: dict | None):
+    user = employee  # ✅ Resolved once per update by IdentityMiddleware
 
     if user:
         # ✅ Ensure `user` has expected structure before accessing elements
@@ -74,23 +73,16 @@ async def get_referral_code(message: Message, state: FSMContext):
 
     # ✅ Only check referrer in DB if it's valid
     if referrer_id:
-        referrer = get_employee(referrer_id)
+        referrer = await get_employee_async(referrer_id)
         if not referrer:
             await message.answer("⚠️ Invalid referral code! Please enter a valid Telegram ID or type '0' if you don’t have one:")
             return
 
     print(f"✅ Adding Employee: {telegram_id}, Name: {full_name}, Phone: {phone_number}, Invited By: {referrer_id}")
 
-    add_employee(telegram_id, full_name, phone_number, referrer_id)
+    # ✅ Employee row and referral reward are written in one transaction
+    await add_employee_async(telegram_id, full_name, phone_number, referrer_id)
     print("✅ Employee Added to DB!")
 
-    # ✅ Check if referral exists before adding to avoid duplicates
-    if referrer_id:
-        try:
-            add_referral(referrer_id, telegram_id)
-            print(f"✅ Referral Added: {referrer_id} referred {telegram_id}")
-        except Exception as e:
-            print(f"⚠️ Referral NOT added (maybe already exists?): {e}")
-
     await message.answer("✅ Registration complete!")
     await state.clear()
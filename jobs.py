@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import time
+
+from async_db import run_write
+
+
+class PeriodicJob:
+    """Runs a blocking maintenance function on the DB writer thread every `interval` seconds.
+
+    Started and stopped with the dispatcher (see bot.py); run_now() lets an
+    admin command trigger it on demand.
+    """
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._task = None
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at = None
+        self.last_result = None
+
+    async def start(self, **kwargs):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self, **kwargs):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_now()
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"❌ Job {self.name} failed: {e}")
+
+    async def run_now(self, *args, **kwargs):
+        result = await run_write(self.func, *args, **kwargs)
+        self.runs += 1
+        self.last_run_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.last_result = result
+        return result
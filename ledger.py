@@ -0,0 +1,94 @@
+import logging
+
+from async_db import reader, writer
+from config import LEDGER_CHECKPOINT_INTERVAL
+from database import get_db_connection, transaction
+from jobs import PeriodicJob
+
+
+def checkpoint_balances():
+    """Folds the ledger entries written since the last checkpoint into ledger_checkpoints.
+
+    Only the new entries are summed, so a checkpoint costs O(entries since the
+    last one). Every materialized balance is then compared with its checkpoint.
+    Balances that differ (e.g. edited by hand) are only reported; an admin
+    records them with post_adjustment(). Returns [(telegram_id, stored_balance, ledger_balance)].
+    """
+    with transaction() as conn:
+        last_entry_id = conn.execute("SELECT last_entry_id FROM ledger_checkpoint WHERE id = 1").fetchone()[0]
+        new_last_entry_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger_entries").fetchone()[0]
+
+        if new_last_entry_id > last_entry_id:
+            conn.execute("""
+                INSERT INTO ledger_checkpoints (employee_id, balance)
+                SELECT employee_id, SUM(amount) FROM ledger_entries WHERE id > ? AND id <= ? GROUP BY employee_id
+                ON CONFLICT (employee_id) DO UPDATE SET balance = balance + excluded.balance
+            """, (last_entry_id, new_last_entry_id))
+            conn.execute(
+                "UPDATE ledger_checkpoint SET last_entry_id = ?, created_at = CURRENT_TIMESTAMP WHERE id = 1",
+                (new_last_entry_id,)
+            )
+
+        drift = conn.execute("""
+            SELECT e.telegram_id, e.balance, COALESCE(c.balance, 0)
+            FROM employees e LEFT JOIN ledger_checkpoints c ON c.employee_id = e.id
+            WHERE COALESCE(e.balance, 0) != COALESCE(c.balance, 0)
+        """).fetchall()
+
+    if drift:
+        logging.warning(f"⚠️ Balances of {len(drift)} employees do not match the ledger (reported)")
+    return drift
+
+
+def _ledger_balance(conn, telegram_id):
+    row = conn.execute("""
+        SELECT COALESCE((SELECT balance FROM ledger_checkpoints WHERE employee_id = e.id), 0)
+             + COALESCE((SELECT SUM(amount) FROM ledger_entries
+                         WHERE employee_id = e.id AND id > (SELECT last_entry_id FROM ledger_checkpoint WHERE id = 1)), 0)
+        FROM employees e WHERE e.telegram_id = ?
+    """, (telegram_id,)).fetchone()
+    return row[0] if row else None
+
+
+def get_ledger_balance(telegram_id):
+    """Balance of an employee recomputed from the ledger: last checkpoint plus the entries since."""
+    with get_db_connection() as conn:
+        return _ledger_balance(conn, telegram_id)
+
+
+def post_adjustment(telegram_id, amount):
+    """Records a balance change made outside the ledger as an 'adjustment' entry.
+
+    The materialized balance is left as it is (that money has already moved).
+    Refused if it would take the ledger balance below zero. Returns the new
+    ledger balance, or None if refused or the employee does not exist.
+    """
+    with transaction() as conn:
+        ledger_balance = _ledger_balance(conn, telegram_id)
+        if ledger_balance is None or ledger_balance + amount < 0:
+            return None
+        conn.execute("""
+            INSERT INTO ledger_entries (employee_id, amount, kind)
+            SELECT id, ?, 'adjustment' FROM employees WHERE telegram_id = ?
+        """, (amount, telegram_id))
+    logging.info(f"📒 Ledger adjustment of {amount:+d} DZD recorded for {telegram_id}")
+    return ledger_balance + amount
+
+
+def get_ledger_entries(telegram_id, limit=20):
+    """Most recent ledger entries of an employee: [(id, amount, kind, ref_id, created_at)], newest first."""
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT l.id, l.amount, l.kind, l.ref_id, l.created_at
+            FROM employees e JOIN ledger_entries l ON l.employee_id = e.id
+            WHERE e.telegram_id = ?
+            ORDER BY l.id DESC LIMIT ?
+        """, (telegram_id, limit)).fetchall()
+
+
+get_ledger_balance_async = reader(get_ledger_balance)
+get_ledger_entries_async = reader(get_ledger_entries)
+post_adjustment_async = writer(post_adjustment)
+
+# ✅ Periodic checkpoint; also runnable on demand with /ledger
+ledger_checkpointer = PeriodicJob("ledger_checkpoint", checkpoint_balances, LEDGER_CHECKPOINT_INTERVAL)
@@ -0,0 +1,241 @@
+"""In-process metrics, served as Prometheus text on /metrics.
+
+Counters and histograms are updated by an aiogram middleware (updates and
+handlers), by the connection class behind database.get_db_connection (SQLite
+statements), by wrappers on the Google Drive client and by the render
+service. Component stats (FSM storage, outbox, backup, caches) are read when
+/metrics is scraped.
+"""
+import functools
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+PREFIX = "bazarbot_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+TRANSFER_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {state[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class StatsGauges:
+    """Exposes the numeric entries of a component's stats() dict as gauges, read at scrape time."""
+
+    def __init__(self, component, stats):
+        self.component = component
+        self.stats = stats
+
+    def render(self):
+        lines = []
+        for key, value in self.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{PREFIX}{self.component}_{key}"
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines += metric.render()
+            except Exception as e:  # A broken stats() must not take the whole endpoint down
+                lines.append(f"# {getattr(metric, 'component', metric)} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+UPDATES = registry.register(Counter("updates_total", "Updates received, by type.", ["type"]))
+UPDATE_ERRORS = registry.register(Counter("update_errors_total", "Updates whose handling raised, by type.", ["type"]))
+UPDATE_SECONDS = registry.register(Histogram("update_duration_seconds", "Time to handle one update, middlewares included.", ["type"]))
+HANDLER_SECONDS = registry.register(Histogram("handler_duration_seconds", "Handler latency.", ["router", "handler"]))
+HANDLER_ERRORS = registry.register(Counter("handler_errors_total", "Handler exceptions.", ["router", "handler"]))
+SQLITE_QUERIES = registry.register(Counter("sqlite_queries_total", "SQLite statements executed, by statement kind.", ["statement"]))
+SQLITE_SECONDS = registry.register(Histogram("sqlite_query_duration_seconds", "SQLite statement execution time.", ["statement"], QUERY_BUCKETS))
+DRIVE_SECONDS = registry.register(Histogram("drive_transfer_duration_seconds", "Google Drive transfer time.", ["operation", "outcome"], TRANSFER_BUCKETS))
+DRIVE_BYTES = registry.register(Counter("drive_transfer_bytes_total", "Bytes moved to or from Google Drive.", ["operation"]))
+RENDER_SECONDS = registry.register(Histogram("pdf_render_duration_seconds", "PDF render time, queueing excluded.", ["report"]))
+
+
+# aiogram
+
+class MetricsMiddleware:
+    """Times updates (as an outer middleware on dp.update) or handlers (as an inner middleware).
+
+    Inner middlewares on the dispatcher apply to the handlers of every included
+    router, so one registration covers all of them. aiogram only needs a
+    callable here; not subclassing BaseMiddleware keeps aiogram out of the
+    imports of database.py.
+    """
+
+    def __init__(self, level):
+        self.level = level  # "update" or "handler"
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.level == "update":
+            labels = {"type": getattr(event, "event_type", type(event).__name__)}
+            UPDATES.inc(**labels)
+            seconds, errors = UPDATE_SECONDS, UPDATE_ERRORS
+        else:
+            callback = data["handler"].callback
+            labels = {"router": callback.__module__.rsplit(".", 1)[-1], "handler": callback.__name__}
+            seconds, errors = HANDLER_SECONDS, HANDLER_ERRORS
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            errors.inc(**labels)
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started, **labels)
+
+
+update_metrics = MetricsMiddleware("update")
+handler_metrics = MetricsMiddleware("handler")
+
+
+# SQLite
+
+def _statement(sql):
+    return sql.lstrip().split(None, 1)[0].upper() if sql and sql.strip() else "EMPTY"
+
+
+def _timed(method, sql):
+    started = time.perf_counter()
+    try:
+        return method()
+    finally:
+        statement = _statement(sql)
+        SQLITE_QUERIES.inc(statement=statement)
+        SQLITE_SECONDS.observe(time.perf_counter() - started, statement=statement)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return _timed(lambda: super(InstrumentedCursor, self).execute(sql, parameters), sql)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed(lambda: super(InstrumentedCursor, self).executemany(sql, seq_of_parameters), sql)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection class (sqlite3.connect(factory=...)) that counts and times every statement."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Google Drive
+
+def drive_transfer(operation, size):
+    """Decorates a DriveClient method: times it and counts the bytes moved.
+
+    `size(args, result)` returns the byte count of a successful call. A call
+    fails if it raises or returns False.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                if result is not False:
+                    outcome = "ok"
+                    DRIVE_BYTES.inc(size(args, result), operation=operation)
+                return result
+            finally:
+                DRIVE_SECONDS.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+        return wrapper
+    return decorate
+
+
+async def handle_metrics(request):
+    """GET /metrics in the Prometheus text format."""
+    from aiohttp import web  # Already loaded by the health server
+
+    return web.Response(body=registry.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
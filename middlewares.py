@@ -0,0 +1,71 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from config import ADMIN_ID
+from database import get_employee_async
+
+# Commands that only registered employees may use
+REGISTERED_COMMANDS = frozenset({"/profile", "/place_order", "/orders", "/earnings", "/pay_me", "/referrals", "/downline"})
+
+# Commands reserved to admins
+ADMIN_COMMANDS = frozenset({
+    "/admin", "/add_user", "/remove_user", "/list_users", "/order_list", "/see_order",
+    "/backup_status", "/cache_stats", "/import_users", "/reconcile_referrals",
+    "/top_sellers", "/top_products", "/wilaya_heatmap", "/ledger", "/reject_payment",
+})
+
+
+def command_of(event):
+    """Returns the bot command a message starts with ("/orders@BazarBot 2" -> "/orders"), or None."""
+    if not isinstance(event, Message):
+        return None
+    text = event.text or event.caption
+    if not text or not text.startswith("/"):
+        return None
+    return text.split(maxsplit=1)[0].split("@", 1)[0]
+
+
+class IdentityMiddleware(BaseMiddleware):
+    """Resolves the caller once per update and injects `employee` and `is_admin` into handlers.
+
+    Unregistered users and non-admins are answered here, before any handler
+    or filter runs, when they hit a protected command.
+    """
+
+    def __init__(self):
+        self.resolved = 0
+        self.rejected_unregistered = 0
+        self.rejected_not_admin = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        self.resolved += 1
+        is_admin = user.id in ADMIN_ID
+        employee = await get_employee_async(user.id)
+        data["is_admin"] = is_admin
+        data["employee"] = employee
+
+        command = command_of(event)
+        if command in ADMIN_COMMANDS and not is_admin:
+            self.rejected_not_admin += 1
+            await event.answer("⛔ You are not authorized to use this command.")
+            return None
+        if command in REGISTERED_COMMANDS and not employee:
+            self.rejected_unregistered += 1
+            await event.answer("⚠️ You are not registered! Please use /start to register first.")
+            return None
+
+        return await handler(event, data)
+
+
+identity_middleware = IdentityMiddleware()
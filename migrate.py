@@ -0,0 +1,159 @@
+"""Versioned schema migrations.
+
+Scripts live in migrations/ as NNN_description.sql and run once each, in
+order, recording their number in the schema_version table. A script runs in
+its own transaction unless its first line is `-- migrate:no-transaction`
+(needed for PRAGMAs such as journal_mode).
+
+    python migrate.py           # apply pending migrations
+    python migrate.py --check   # assert the hot queries use an index
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+NO_TRANSACTION = "-- migrate:no-transaction"
+
+# Queries that run on every command; each must be answered from an index.
+HOT_QUERIES = {
+    "get_employee": ("SELECT * FROM employees WHERE telegram_id = ?", (1,)),
+    "get_employee_orders": (
+        "SELECT product_name, product_code, quantity, wilaya, baladiya, status FROM orders "
+        "WHERE employee_id = ? ORDER BY id DESC",
+        (1,),
+    ),
+    "get_employee_orders_page": (
+        "SELECT id, product_name, product_code, quantity, wilaya, baladiya, status FROM orders "
+        "WHERE employee_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (1, 100, 11),
+    ),
+    "get_recent_orders": (
+        "SELECT id, employee_id, customer_fullname, status, created_at FROM orders ORDER BY created_at DESC LIMIT 10",
+        (),
+    ),
+    "get_downline": (
+        "SELECT p.depth, COUNT(*), COALESCE(SUM(c.amount), 0) FROM employees e "
+        "JOIN referral_paths p ON p.ancestor_id = e.id "
+        "LEFT JOIN referral_commissions c ON c.beneficiary_id = p.ancestor_id AND c.referred_id = p.descendant_id "
+        "WHERE e.telegram_id = ? GROUP BY p.depth ORDER BY p.depth",
+        (1,),
+    ),
+    "referral_upline": (
+        "SELECT ancestor_id, depth FROM referral_paths WHERE descendant_id = ? AND depth <= ?",
+        (1, 3),
+    ),
+    "ledger_since_checkpoint": (
+        "SELECT SUM(amount) FROM ledger_entries WHERE employee_id = ? AND id > ?",
+        (1, 100),
+    ),
+    "employee_payments": (
+        "SELECT amount, status, requested_at FROM payments WHERE employee_id = ? ORDER BY requested_at DESC",
+        (1,),
+    ),
+}
+
+
+def discover_migrations():
+    """Returns [(version, name, path)] sorted by version."""
+    migrations = []
+    for file_name in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r"^(\d+)_(.+)\.sql$", file_name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, file_name)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version numbers in migrations/")
+    return migrations
+
+
+def run_migrations(db_path):
+    """Applies every migration not yet recorded in schema_version. Returns the versions applied."""
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.isolation_level = None  # Transactions are spelled out in the scripts below
+    applied_now = []
+    try:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+        for version, name, path in discover_migrations():
+            if version in applied:
+                continue
+
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+
+            logging.info(f"🛠 Applying migration {version:03d}_{name}...")
+            record = f"INSERT INTO schema_version (version, name) VALUES ({version}, '{name.replace(chr(39), '')}');"
+            if sql.lstrip().startswith(NO_TRANSACTION):
+                conn.executescript(sql)
+                conn.execute(record)
+            else:
+                try:
+                    conn.executescript(f"BEGIN IMMEDIATE;\n{sql}\n;\n{record}\nCOMMIT;")
+                except sqlite3.Error:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+            applied_now.append(version)
+
+        if applied_now:
+            logging.info(f"✅ Database schema migrated to version {max(applied_now)}")
+        return applied_now
+    finally:
+        conn.close()
+
+
+def schema_version(db_path):
+    """Returns the highest applied migration number (0 for a fresh database)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def check_query_plans(db_path):
+    """Runs EXPLAIN QUERY PLAN on every hot query. Returns {name: problem} for those that scan or sort."""
+    conn = sqlite3.connect(db_path)
+    problems = {}
+    try:
+        for name, (sql, params) in HOT_QUERIES.items():
+            details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            for detail in details:
+                full_scan = detail.startswith("SCAN") and "INDEX" not in detail
+                if full_scan or "USE TEMP B-TREE" in detail:
+                    problems[name] = detail
+                    break
+    finally:
+        conn.close()
+    return problems
+
+
+if __name__ == "__main__":
+    from database import DB_PATH
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run_migrations(DB_PATH)
+    print(f"Schema version: {schema_version(DB_PATH)}")
+
+    if "--check" in sys.argv:
+        problems = check_query_plans(DB_PATH)
+        for name, detail in problems.items():
+            print(f"❌ {name}: {detail}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
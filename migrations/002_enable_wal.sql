@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- WAL lets readers run during writes and keeps backups consistent.
+-- journal_mode cannot change inside a transaction, hence no-transaction.
+PRAGMA journal_mode = WAL;
@@ -0,0 +1,17 @@
+-- Indexes for the queries that run on every command (see migrate.HOT_QUERIES).
+
+-- get_employee_orders: WHERE employee_id = ? ORDER BY id DESC, covering the selected columns
+CREATE INDEX IF NOT EXISTS idx_orders_employee
+    ON orders (employee_id, id, product_name, product_code, quantity, wilaya, baladiya, status);
+
+-- handlers/orders.get_recent_orders: ORDER BY created_at DESC LIMIT 10
+CREATE INDEX IF NOT EXISTS idx_orders_created_at
+    ON orders (created_at, employee_id, customer_fullname, status);
+
+-- count_referrals: WHERE referrer_id = ?
+CREATE INDEX IF NOT EXISTS idx_referrals_referrer
+    ON referrals (referrer_id);
+
+-- payment history per employee
+CREATE INDEX IF NOT EXISTS idx_payments_employee
+    ON payments (employee_id, requested_at);
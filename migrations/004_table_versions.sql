@@ -0,0 +1,39 @@
+-- Per-table change counters, bumped by triggers on every write. Cached
+-- reports (report_cache.py) are valid for as long as the counters of the
+-- tables they read stay the same.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_versions (table_name) VALUES ('employees'), ('orders');
+
+CREATE TRIGGER IF NOT EXISTS trg_employees_version_insert AFTER INSERT ON employees
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'employees';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_employees_version_update AFTER UPDATE ON employees
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'employees';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_employees_version_delete AFTER DELETE ON employees
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'employees';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_insert AFTER INSERT ON orders
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'orders';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_update AFTER UPDATE ON orders
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'orders';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_delete AFTER DELETE ON orders
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'orders';
+END;
@@ -0,0 +1,12 @@
+-- Persistent tier of fsm_storage.SQLiteStorage: half-filled registration and
+-- order forms, one row per conversation.
+CREATE TABLE IF NOT EXISTS fsm_state (
+    storage_key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+);
+
+-- Purge of abandoned forms: WHERE updated_at < ?
+CREATE INDEX IF NOT EXISTS idx_fsm_state_updated_at
+    ON fsm_state (updated_at);
@@ -0,0 +1,14 @@
+-- Watermark of the admin order digest (digest.py): orders with a higher id
+-- have not been sent to the admins yet. Starts after the existing orders.
+CREATE TABLE IF NOT EXISTS order_digest (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_order_id INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO order_digest (id, last_order_id)
+SELECT 1, COALESCE(MAX(id), 0) FROM orders;
+
+-- Orders above the watermark already sent on their own (urgent); the digest skips them
+CREATE TABLE IF NOT EXISTS order_digest_sent (
+    order_id INTEGER PRIMARY KEY
+);
@@ -0,0 +1,24 @@
+-- Referral statistics kept on the employee row: invite_count (already there,
+-- previously bumped by hand in add_referral) and referral_earnings, both
+-- maintained by triggers on referrals. Each referral records its reward.
+ALTER TABLE referrals ADD COLUMN reward INTEGER NOT NULL DEFAULT 50;
+ALTER TABLE employees ADD COLUMN referral_earnings INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_referrals_counters_insert AFTER INSERT ON referrals
+BEGIN
+    UPDATE employees
+    SET invite_count = invite_count + 1, referral_earnings = referral_earnings + NEW.reward
+    WHERE id = NEW.referrer_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_referrals_counters_delete AFTER DELETE ON referrals
+BEGIN
+    UPDATE employees
+    SET invite_count = invite_count - 1, referral_earnings = referral_earnings - OLD.reward
+    WHERE id = OLD.referrer_id;
+END;
+
+-- Backfill from the referrals that already exist
+UPDATE employees SET
+    invite_count = (SELECT COUNT(*) FROM referrals r WHERE r.referrer_id = employees.id),
+    referral_earnings = (SELECT COALESCE(SUM(reward), 0) FROM referrals r WHERE r.referrer_id = employees.id);
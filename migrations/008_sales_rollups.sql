@@ -0,0 +1,111 @@
+-- Analytics rollups (handlers/analytics.py): order counts and quantities per
+-- day and status, by wilaya, by product and by seller. Triggers on orders keep
+-- them current, so reports read a few rows per day instead of scanning orders.
+-- Days are UTC dates of orders.created_at.
+CREATE TABLE IF NOT EXISTS sales_by_wilaya (
+    day TEXT NOT NULL,
+    wilaya TEXT NOT NULL,
+    status TEXT NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, wilaya, status)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sales_by_product (
+    day TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    status TEXT NOT NULL,
+    product_name TEXT NOT NULL,  -- Name on the most recent order
+    orders INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_code, status)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sales_by_employee (
+    day TEXT NOT NULL,
+    employee_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, employee_id, status)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_rollup_insert AFTER INSERT ON orders
+BEGIN
+    INSERT INTO sales_by_wilaya (day, wilaya, status, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.wilaya, COALESCE(NEW.status, 'Pending'), 1, NEW.quantity)
+    ON CONFLICT (day, wilaya, status) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+
+    INSERT INTO sales_by_product (day, product_code, status, product_name, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.product_code, COALESCE(NEW.status, 'Pending'), NEW.product_name, 1, NEW.quantity)
+    ON CONFLICT (day, product_code, status) DO UPDATE
+    SET product_name = excluded.product_name, orders = orders + 1, quantity = quantity + excluded.quantity;
+
+    INSERT INTO sales_by_employee (day, employee_id, status, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.employee_id, COALESCE(NEW.status, 'Pending'), 1, NEW.quantity)
+    ON CONFLICT (day, employee_id, status) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_rollup_delete AFTER DELETE ON orders
+BEGIN
+    UPDATE sales_by_wilaya SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND wilaya = OLD.wilaya AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_wilaya
+    WHERE day = date(OLD.created_at) AND wilaya = OLD.wilaya AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+
+    UPDATE sales_by_product SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND product_code = OLD.product_code AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_product
+    WHERE day = date(OLD.created_at) AND product_code = OLD.product_code AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+
+    UPDATE sales_by_employee SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_employee
+    WHERE day = date(OLD.created_at) AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+END;
+
+-- A status change (or a corrected order) moves the order from its old rollup rows to the new ones
+CREATE TRIGGER IF NOT EXISTS trg_orders_rollup_update
+AFTER UPDATE OF status, quantity, wilaya, product_code, product_name, employee_id, created_at ON orders
+BEGIN
+    UPDATE sales_by_wilaya SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND wilaya = OLD.wilaya AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_wilaya
+    WHERE day = date(OLD.created_at) AND wilaya = OLD.wilaya AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+
+    UPDATE sales_by_product SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND product_code = OLD.product_code AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_product
+    WHERE day = date(OLD.created_at) AND product_code = OLD.product_code AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+
+    UPDATE sales_by_employee SET orders = orders - 1, quantity = quantity - OLD.quantity
+    WHERE day = date(OLD.created_at) AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, 'Pending');
+    DELETE FROM sales_by_employee
+    WHERE day = date(OLD.created_at) AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, 'Pending') AND orders <= 0;
+
+    INSERT INTO sales_by_wilaya (day, wilaya, status, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.wilaya, COALESCE(NEW.status, 'Pending'), 1, NEW.quantity)
+    ON CONFLICT (day, wilaya, status) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+
+    INSERT INTO sales_by_product (day, product_code, status, product_name, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.product_code, COALESCE(NEW.status, 'Pending'), NEW.product_name, 1, NEW.quantity)
+    ON CONFLICT (day, product_code, status) DO UPDATE
+    SET product_name = excluded.product_name, orders = orders + 1, quantity = quantity + excluded.quantity;
+
+    INSERT INTO sales_by_employee (day, employee_id, status, orders, quantity)
+    VALUES (date(NEW.created_at), NEW.employee_id, COALESCE(NEW.status, 'Pending'), 1, NEW.quantity)
+    ON CONFLICT (day, employee_id, status) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+END;
+
+-- One-off backfill from the orders placed before this migration
+INSERT INTO sales_by_wilaya (day, wilaya, status, orders, quantity)
+SELECT date(created_at), wilaya, COALESCE(status, 'Pending'), COUNT(*), SUM(quantity)
+FROM orders GROUP BY 1, 2, 3;
+
+INSERT INTO sales_by_product (day, product_code, status, product_name, orders, quantity)
+SELECT date(created_at), product_code, COALESCE(status, 'Pending'), MAX(product_name), COUNT(*), SUM(quantity)
+FROM orders GROUP BY 1, 2, 3;
+
+INSERT INTO sales_by_employee (day, employee_id, status, orders, quantity)
+SELECT date(created_at), employee_id, COALESCE(status, 'Pending'), COUNT(*), SUM(quantity)
+FROM orders GROUP BY 1, 2, 3;
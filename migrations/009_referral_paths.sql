@@ -0,0 +1,88 @@
+-- Referral graph as a closure table: one row per (ancestor, descendant) pair
+-- with the number of referral hops between them, so uplines and whole
+-- downlines are index lookups instead of recursive walks. Kept current by
+-- triggers on referrals; handlers/referral_utils.rebuild_referral_paths()
+-- recomputes it from referrals if it ever needs repair.
+CREATE TABLE IF NOT EXISTS referral_paths (
+    ancestor_id INTEGER NOT NULL,
+    descendant_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,  -- 1 = direct referral
+    PRIMARY KEY (ancestor_id, descendant_id)
+) WITHOUT ROWID;
+
+-- Upline of an employee, nearest first (commission fan-out)
+CREATE INDEX IF NOT EXISTS idx_referral_paths_descendant ON referral_paths (descendant_id, depth, ancestor_id);
+
+-- Downline of an employee level by level (/downline)
+CREATE INDEX IF NOT EXISTS idx_referral_paths_ancestor_depth ON referral_paths (ancestor_id, depth, descendant_id);
+
+-- Links the referrer and its upline to the referred employee and its downline
+CREATE TRIGGER IF NOT EXISTS trg_referrals_paths_insert AFTER INSERT ON referrals
+BEGIN
+    INSERT OR IGNORE INTO referral_paths (ancestor_id, descendant_id, depth)
+    SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+    FROM (
+        SELECT ancestor_id, depth FROM referral_paths WHERE descendant_id = NEW.referrer_id
+        UNION ALL SELECT NEW.referrer_id, 0
+    ) up, (
+        SELECT descendant_id, depth FROM referral_paths WHERE ancestor_id = NEW.referred_id
+        UNION ALL SELECT NEW.referred_id, 0
+    ) down;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_referrals_paths_delete AFTER DELETE ON referrals
+BEGIN
+    DELETE FROM referral_paths
+    WHERE ancestor_id IN (SELECT ancestor_id FROM referral_paths WHERE descendant_id = OLD.referrer_id UNION ALL SELECT OLD.referrer_id)
+      AND descendant_id IN (SELECT descendant_id FROM referral_paths WHERE ancestor_id = OLD.referred_id UNION ALL SELECT OLD.referred_id);
+END;
+
+-- Every referral commission paid, at any level. Crediting the beneficiary is
+-- done by trigger, so a set-based INSERT ... SELECT pays a whole upline at once.
+CREATE TABLE IF NOT EXISTS referral_commissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    beneficiary_id INTEGER NOT NULL,
+    referred_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (beneficiary_id) REFERENCES employees (id),
+    FOREIGN KEY (referred_id) REFERENCES employees (id),
+    UNIQUE (beneficiary_id, referred_id)  -- One commission per new employee per upline member
+);
+
+-- Commissions paid so far were the direct reward only; they are already in the balances
+INSERT OR IGNORE INTO referral_commissions (beneficiary_id, referred_id, depth, amount, created_at)
+SELECT referrer_id, referred_id, 1, reward, referred_at FROM referrals;
+
+CREATE TRIGGER IF NOT EXISTS trg_referral_commissions_credit AFTER INSERT ON referral_commissions
+BEGIN
+    UPDATE employees
+    SET balance = balance + NEW.amount, earnings = earnings + NEW.amount, referral_earnings = referral_earnings + NEW.amount
+    WHERE id = NEW.beneficiary_id;
+END;
+
+-- referral_earnings now follows referral_commissions (all levels); referrals only drive invite_count
+DROP TRIGGER IF EXISTS trg_referrals_counters_insert;
+DROP TRIGGER IF EXISTS trg_referrals_counters_delete;
+
+CREATE TRIGGER IF NOT EXISTS trg_referrals_count_insert AFTER INSERT ON referrals
+BEGIN
+    UPDATE employees SET invite_count = invite_count + 1 WHERE id = NEW.referrer_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_referrals_count_delete AFTER DELETE ON referrals
+BEGIN
+    UPDATE employees SET invite_count = invite_count - 1 WHERE id = OLD.referrer_id;
+END;
+
+-- Bulk build from the referrals that already exist
+INSERT OR IGNORE INTO referral_paths (ancestor_id, descendant_id, depth)
+WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+    SELECT referrer_id, referred_id, 1 FROM referrals
+    UNION ALL
+    SELECT p.ancestor_id, r.referred_id, p.depth + 1
+    FROM paths p JOIN referrals r ON r.referrer_id = p.descendant_id
+    WHERE p.depth < 1000  -- Guards against a referral cycle
+)
+SELECT ancestor_id, descendant_id, MIN(depth) FROM paths GROUP BY ancestor_id, descendant_id;
@@ -0,0 +1,89 @@
+-- Balance ledger (ledger.py): every credit and debit is an append-only entry.
+-- employees.balance stays the materialized balance (an O(1) read for
+-- /earnings and /pay_me) and the trigger below applies every entry to it.
+-- Periodic checkpoints record each balance as of a ledger position, so
+-- verifying balances only sums the entries written since; a balance edited
+-- outside the ledger is reported, and an admin records it with an
+-- 'adjustment' entry.
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL,  -- No foreign key: history outlives removed employees
+    amount INTEGER NOT NULL,  -- Positive = credit, negative = debit
+    kind TEXT NOT NULL CHECK (kind IN ('opening', 'referral_commission', 'payout', 'payout_release', 'adjustment')),
+    ref_id INTEGER,  -- referral_commissions.id or payments.id, depending on kind
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_employee ON ledger_entries (employee_id, id);
+
+-- Balances from before the ledger become one opening entry each
+INSERT INTO ledger_entries (employee_id, amount, kind)
+SELECT id, balance, 'opening' FROM employees WHERE COALESCE(balance, 0) != 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_entries_no_update BEFORE UPDATE ON ledger_entries
+BEGIN
+    SELECT RAISE(ABORT, 'ledger_entries is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ledger_entries_no_delete BEFORE DELETE ON ledger_entries
+BEGIN
+    SELECT RAISE(ABORT, 'ledger_entries is append-only');
+END;
+
+-- Adjustments record balance changes made outside the ledger: that money has already moved
+CREATE TRIGGER IF NOT EXISTS trg_ledger_entries_apply AFTER INSERT ON ledger_entries
+WHEN NEW.kind != 'adjustment'
+BEGIN
+    UPDATE employees
+    SET balance = COALESCE(balance, 0) + NEW.amount,
+        earnings = earnings + CASE WHEN NEW.kind = 'referral_commission' THEN NEW.amount ELSE 0 END,
+        referral_earnings = referral_earnings + CASE WHEN NEW.kind = 'referral_commission' THEN NEW.amount ELSE 0 END
+    WHERE id = NEW.employee_id;
+END;
+
+-- Referral commissions are now credited through the ledger
+DROP TRIGGER IF EXISTS trg_referral_commissions_credit;
+
+CREATE TRIGGER IF NOT EXISTS trg_referral_commissions_ledger AFTER INSERT ON referral_commissions
+BEGIN
+    INSERT INTO ledger_entries (employee_id, amount, kind, ref_id)
+    VALUES (NEW.beneficiary_id, NEW.amount, 'referral_commission', NEW.id);
+END;
+
+-- Balance of every employee as of ledger entry ledger_checkpoint.last_entry_id
+CREATE TABLE IF NOT EXISTS ledger_checkpoints (
+    employee_id INTEGER PRIMARY KEY,
+    balance INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ledger_checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_entry_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO ledger_checkpoints (employee_id, balance)
+SELECT employee_id, SUM(amount) FROM ledger_entries GROUP BY employee_id;
+
+INSERT OR IGNORE INTO ledger_checkpoint (id, last_entry_id)
+SELECT 1, COALESCE(MAX(id), 0) FROM ledger_entries;
+
+-- A payout is debited when requested; rejecting the request releases it
+-- ('payout_release' entry), so payments gains a 'rejected' status
+CREATE TABLE payments_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL,
+    employee_name TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    status TEXT CHECK( status IN ('pending', 'approved', 'paid', 'rejected') ) DEFAULT 'pending',
+    total_balance INTEGER NOT NULL,
+    requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    approved_at TIMESTAMP NULL
+);
+
+INSERT INTO payments_new SELECT id, employee_id, employee_name, phone_number, amount, status, total_balance, requested_at, approved_at FROM payments;
+DROP TABLE payments;
+ALTER TABLE payments_new RENAME TO payments;
+
+CREATE INDEX IF NOT EXISTS idx_payments_employee ON payments (employee_id, requested_at);
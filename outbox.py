@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+from aiogram.methods import TelegramMethod
+
+from config import OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, OUTBOX_MAX_RETRIES, OUTBOX_CONCURRENCY
+
+# Lower runs first
+URGENT = 0
+NORMAL = 5
+LOW = 9
+
+
+class TokenBucket:
+    """Allows `rate` sends per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0  # Set by Telegram's RetryAfter
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a send is allowed (0 = now)."""
+        if self.paused_until > now:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+class _Job:
+    __slots__ = ("bot", "method", "chat_id", "enqueued_at", "attempts", "not_before")
+
+    def __init__(self, bot, method):
+        self.bot = bot
+        self.method = method
+        self.chat_id = getattr(method, "chat_id", None)
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class Outbox:
+    """Background sender for bot-initiated messages (admin notifications, digests).
+
+    Handlers enqueue a Bot API method and return immediately. A single
+    dispatcher task sends jobs in priority order while respecting a global and
+    a per-chat token bucket, keeps one send in flight per chat so messages to
+    a chat stay in order, honours Telegram's RetryAfter and retries network
+    errors a bounded number of times.
+    """
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE, chat_rate=OUTBOX_CHAT_RATE, chat_burst=OUTBOX_CHAT_BURST,
+                 max_retries=OUTBOX_MAX_RETRIES, concurrency=OUTBOX_CONCURRENCY):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+
+        self._queue = []  # heap of (priority, seq, _Job)
+        self._seq = itertools.count()
+        self._chats = {}  # chat_id -> TokenBucket
+        self._busy = set()  # chats with a send in flight
+        self._wakeup = None
+        self._task = None
+        self._sending = set()
+
+        self.max_queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.retry_after_hits = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def send(self, bot: Bot, method: TelegramMethod, priority=NORMAL):
+        """Queues `method` (e.g. SendMessage(...)) for delivery and returns at once."""
+        self._push(_Job(bot, method), priority)
+
+    def _push(self, job, priority):
+        heapq.heappush(self._queue, (priority, next(self._seq), job))
+        self.max_queued = max(self.max_queued, len(self._queue))
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    # Dispatcher
+
+    def _delay(self, job, now):
+        """Seconds until `job` may be sent, or None while its chat has a send in flight."""
+        if job.chat_id in self._busy:
+            return None
+        bucket = self._chats.get(job.chat_id)
+        return max(job.not_before - now, bucket.wait_time(now) if bucket else 0.0)
+
+    def _next_ready(self, now):
+        """Pops the best job that may be sent now, or returns (None, seconds to wait)."""
+        if not self._queue:
+            return None, None
+        delay = self._delay(self._queue[0][2], now)
+        if delay is not None and delay <= 0:
+            return heapq.heappop(self._queue), None
+
+        # The head is held back by its chat's limit; look for another chat's job
+        wait = delay
+        for entry in sorted(self._queue)[1:]:
+            delay = self._delay(entry[2], now)
+            if delay is None:
+                continue
+            if delay <= 0:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                return entry, None
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            global_wait = self.global_bucket.wait_time(now)
+            entry, wait = (None, global_wait) if global_wait > 0 else self._next_ready(now)
+
+            if entry is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await slots.acquire()
+            priority, _, job = entry
+            now = time.monotonic()
+            self.global_bucket.take(now)
+            self._chat_bucket(job.chat_id).take(now)
+            self._busy.add(job.chat_id)
+            task = asyncio.create_task(self._deliver(job, priority, slots))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+            self._prune_buckets(now)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune_buckets(self, now):
+        if len(self._chats) > 1000:
+            for chat_id in [c for c, b in self._chats.items() if c not in self._busy and b.idle(now)]:
+                del self._chats[chat_id]
+
+    async def _deliver(self, job, priority, slots):
+        job.attempts += 1
+        try:
+            await job.bot(job.method)
+            latency = time.monotonic() - job.enqueued_at
+            self.sent += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        except TelegramRetryAfter as e:
+            self.retry_after_hits += 1
+            logging.warning(f"⚠️ Flood control for chat {job.chat_id}, retrying in {e.retry_after} s")
+            self._chat_bucket(job.chat_id).paused_until = time.monotonic() + e.retry_after
+            self._retry(job, priority, delay=0)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            logging.warning(f"⚠️ Sending to chat {job.chat_id} failed ({e}), attempt {job.attempts}")
+            self._retry(job, priority, delay=min(2 ** job.attempts, 60))
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"❌ Dropping message to chat {job.chat_id}: {e}")
+        finally:
+            self._busy.discard(job.chat_id)
+            slots.release()
+            if self._wakeup:
+                self._wakeup.set()
+
+    def _retry(self, job, priority, delay):
+        if job.attempts > self.max_retries:
+            self.failed += 1
+            logging.error(f"❌ Giving up on message to chat {job.chat_id} after {job.attempts} attempts")
+            return
+        self.retries += 1
+        job.not_before = time.monotonic() + delay
+        self._push(job, priority)
+
+    async def close(self, timeout=10):
+        """Gives queued messages up to `timeout` seconds to go out, then stops."""
+        deadline = time.monotonic() + timeout
+        while (self._queue or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._queue:
+            logging.warning(f"⚠️ {len(self._queue)} outgoing messages were not sent before shutdown")
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            "queued": len(self._queue),
+            "max_queued": self.max_queued,
+            "in_flight": len(self._sending),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "retry_after_hits": self.retry_after_hits,
+            "avg_latency": round(self.total_latency / self.sent, 3) if self.sent else 0.0,
+            "max_latency": round(self.max_latency, 3),
+        }
+
+
+outbox = Outbox()
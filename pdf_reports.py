@@ -0,0 +1,298 @@
+"""PDF renderers for every report the bot sends.
+
+Each function takes plain picklable data and returns the finished PDF as
+bytes, so it can run in the rendering process pool (see rendering.py)
+without touching the database or aiogram, and without temp files.
+
+fpdf and reportlab are imported inside the renderers, so importing this
+module (which every report handler does) costs nothing at bot startup;
+the render workers load them once when they warm up.
+"""
+import io
+import os
+from datetime import datetime
+from functools import lru_cache
+
+
+def render_new_order(order_id, data, employee):
+    """Renders the admin copy of a newly placed order and returns the PDF bytes."""
+    from reportlab.lib.colors import black, gray
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+
+    # Colors & Styling
+    c.setFillColor(black)
+
+    # **Header Section**
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(200, 820, "🛍 Bazar Order Confirmation")
+    c.setFont("Helvetica", 12)
+    c.setFillColor(gray)
+    c.drawString(200, 800, f"Order ID: {order_id}  |  Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    c.setFillColor(black)
+
+    # **Employee Details**
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 770, "👨‍💼 Employee Details")
+    c.setFont("Helvetica", 12)
+    c.drawString(70, 750, f"🆔 ID: {employee['id']}")
+    c.drawString(70, 730, f"👤 Name: {employee['full_name']}")
+    c.drawString(70, 710, f"📞 Phone: {employee['phone_number']}")
+    c.drawString(70, 690, f"💬 Telegram: {employee['telegram_id']}")
+
+    # **Customer & Order Details**
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 660, "📦 Order Details")
+    c.setFont("Helvetica", 12)
+    c.drawString(70, 640, f"👤 Customer: {data['customer_fullname']} ({data['customer_phone']})")
+    c.drawString(70, 620, f"📦 Product: {data['product_name']} (Code: {data['product_code']})")
+    c.drawString(70, 600, f"🔢 Quantity: {data['quantity']}")
+
+    # **Address Section**
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 570, "📍 Shipping Address")
+    c.setFont("Helvetica", 12)
+    c.drawString(70, 550, f"🏙 Wilaya: {data['wilaya']}")
+    c.drawString(70, 530, f"🏠 Baladiya: {data['baladiya']}")
+    c.drawString(70, 510, f"📌 Exact Address: {data['exact_address']}")
+
+    # **Status Section**
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 480, "🔹 Order Status")
+    c.setFont("Helvetica", 12)
+    c.drawString(70, 460, "🟡 Pending")
+
+    # **Footer (Signature or Notes)**
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, 420, "📜 Notes:")
+    c.setFont("Helvetica-Oblique", 12)
+    c.drawString(70, 400, "⚠ Please confirm the order details before processing.")
+
+    c.save()
+    return buffer.getvalue()
+
+
+def render_recent_orders(orders):
+    """Renders the recent orders report and returns the PDF bytes."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(200, height - 50, "📦 Recent Orders Report")
+
+    c.setFont("Helvetica", 12)
+    y_position = height - 80
+    for order in orders:
+        order_id, employee_id, customer_name, status, created_at = order
+        text = f"🆔 Order ID: {order_id} | 👤 {customer_name} | 📅 {created_at} | 🔹 {status}"
+        c.drawString(50, y_position, text)
+        y_position -= 20
+
+        if y_position < 50:  # Create a new page if needed
+            c.showPage()
+            c.setFont("Helvetica", 12)
+            y_position = height - 50
+
+    c.save()
+    return buffer.getvalue()
+
+
+def render_order_details(order):
+    """Renders a single order's details and returns the PDF bytes."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    order_id, employee_id, customer_fullname, customer_phone, product_name, product_code, quantity, wilaya, baladiya, exact_address, status, created_at = order
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(200, height - 50, f"📦 Order Details (ID: {order_id})")
+
+    c.setFont("Helvetica", 12)
+    details = [
+        f"🆔 Order ID: {order_id}",
+        f"👤 Employee ID: {employee_id}",
+        f"👤 Customer: {customer_fullname} ({customer_phone})",
+        f"📦 Product: {product_name} (Code: {product_code})",
+        f"📊 Quantity: {quantity}",
+        f"📍 Address: {wilaya}, {baladiya}, {exact_address}",
+        f"🔹 Status: {status}",
+        f"📅 Date: {created_at}",
+    ]
+
+    y_position = height - 100
+    for line in details:
+        c.drawString(50, y_position, line)
+        y_position -= 20
+
+    c.save()
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def order_pdf_class():
+    """Builds the OrderPDF class on first use, so fpdf is only imported when a report is rendered."""
+    from fpdf import FPDF
+
+    class OrderPDF(FPDF):
+        def header(self):
+            """Custom header with logo and title"""
+            logo_path = "bazar1.jpg"  # Ensure this file exists
+
+            # Add logo if available
+            if os.path.exists(logo_path):
+                self.image(logo_path, x=10, y=5, w=50)  # x=10 (left), y=5 (higher), w=50 (bigger)
+            # Adjust size & position
+
+            # Title
+            self.set_font("Arial", "B", 18)
+            self.cell(200, 10, "Order History", ln=True, align="C")
+            self.ln(15)  # Space after title
+
+        def footer(self):
+            """Custom footer with a message"""
+            self.set_y(-15)
+            self.set_font("Arial", "I", 10)
+            self.cell(0, 10, "Thank you for using BazarBot!", align="C")
+
+    return OrderPDF
+
+
+def render_order_history(orders):
+    """Renders an employee's order history and returns the PDF bytes."""
+    pdf = order_pdf_class()()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Table Header
+    pdf.set_fill_color(50, 50, 50)  # Dark Gray
+    pdf.set_text_color(255, 255, 255)  # White
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(40, 10, "Product", 1, 0, "C", 1)
+    pdf.cell(30, 10, "Code", 1, 0, "C", 1)
+    pdf.cell(20, 10, "Qty", 1, 0, "C", 1)
+    pdf.cell(40, 10, "Location", 1, 0, "C", 1)
+    pdf.cell(40, 10, "Status", 1, 1, "C", 1)
+
+    # Reset text color
+    pdf.set_text_color(0, 0, 0)
+
+    # Table Data
+    pdf.set_font("Arial", size=11)
+    for product_name, product_code, quantity, wilaya, baladiya, status in orders:
+        pdf.cell(40, 10, product_name, 1)
+        pdf.cell(30, 10, product_code, 1)
+        pdf.cell(20, 10, str(quantity), 1, 0, "C")
+        pdf.cell(40, 10, f"{wilaya}, {baladiya}", 1)
+        pdf.cell(40, 10, status, 1, 1, "C")
+
+    # fpdf 1.x returns the document as a latin-1 string
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def render_employee_list(employees, part=None):
+    """Renders the employee table (one part of it, for large rosters) and returns the PDF bytes."""
+    from fpdf import FPDF
+
+    pdf = FPDF(orientation="L", unit="mm", format="A4")  # Landscape mode for better spacing
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Arial", "B", 16)
+    title = f"Employee List Report - Part {part}" if part else "Employee List Report"
+    pdf.cell(280, 10, title, ln=True, align="C")
+    pdf.ln(10)
+
+    # Table Header
+    pdf.set_font("Arial", "B", 9)
+    headers = ["ID", "Telegram ID", "Full Name", "Phone", "Invited By", "Balance", "Earnings", "Date Joined", "Invites"]
+    col_widths = [10, 30, 50, 25, 30, 25, 25, 35, 15]  # Adjusted column widths
+
+    for i, header in enumerate(headers):
+        pdf.cell(col_widths[i], 10, header, 1, 0, "C")
+    pdf.ln()
+
+    # Table Rows
+    pdf.set_font("Arial", "", 9)
+    for emp in employees:
+        for i, data in enumerate(emp):
+            pdf.cell(col_widths[i], 10, str(data), 1, 0, "C")
+        pdf.ln()
+
+    # fpdf 1.x returns the document as a latin-1 string
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _latin1(value):
+    """FPDF 1.x core fonts are latin-1 only; replace anything else instead of failing the whole report."""
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def render_order_digest(orders):
+    """Renders a batch of new orders grouped by wilaya and product, and returns the PDF bytes.
+
+    Rows are (id, created_at, seller, customer_fullname, customer_phone, product_name,
+    product_code, quantity, wilaya, baladiya, exact_address).
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF(orientation="L", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(277, 10, f"Order Digest - {len(orders)} orders (#{orders[0][0]} to #{orders[-1][0]})", ln=True, align="C")
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(277, 6, f"{orders[0][1]} to {orders[-1][1]}", ln=True, align="C")
+    pdf.ln(4)
+
+    # Totals per product
+    totals = {}
+    for order in orders:
+        count, quantity = totals.get((order[5], order[6]), (0, 0))
+        totals[(order[5], order[6])] = (count + 1, quantity + order[7])
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(277, 8, "Totals by product", ln=True)
+    pdf.set_font("Arial", "", 10)
+    for (product_name, product_code), (count, quantity) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        pdf.cell(277, 6, _latin1(f"{product_name} ({product_code}): {quantity} units in {count} orders"), ln=True)
+    pdf.ln(4)
+
+    headers = ["#", "Product", "Code", "Qty", "Customer", "Phone", "Baladiya", "Address", "Seller"]
+    col_widths = [14, 40, 24, 12, 40, 28, 30, 55, 34]
+
+    by_wilaya = {}
+    for order in orders:
+        by_wilaya.setdefault(order[8], []).append(order)
+
+    for wilaya in sorted(by_wilaya):
+        rows = sorted(by_wilaya[wilaya], key=lambda order: (order[5], order[0]))
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(277, 9, _latin1(f"{wilaya} - {len(rows)} orders"), ln=True)
+
+        pdf.set_font("Arial", "B", 9)
+        for header, width in zip(headers, col_widths):
+            pdf.cell(width, 7, header, 1, 0, "C")
+        pdf.ln()
+
+        pdf.set_font("Arial", "", 8)
+        for order_id, _, seller, customer, phone, product_name, product_code, quantity, _, baladiya, address in rows:
+            values = [order_id, product_name, product_code, quantity, customer, phone, baladiya, address, seller]
+            for value, width in zip(values, col_widths):
+                pdf.cell(width, 7, _latin1(value)[:int(width / 1.6)], 1, 0, "C")
+            pdf.ln()
+        pdf.ln(3)
+
+    # fpdf 1.x returns the document as a latin-1 string
+    return pdf.output(dest="S").encode("latin-1")
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import RENDER_WORKERS, RENDER_CONCURRENCY
+from metrics import RENDER_SECONDS
+
+
+def _warm_up():
+    """Imports the PDF libraries in a worker so the first real render is fast."""
+    import fpdf  # noqa: F401
+    import reportlab.pdfgen.canvas  # noqa: F401
+    import pdf_reports  # noqa: F401
+    return True
+
+
+class RenderService:
+    """Runs CPU-bound PDF rendering (pdf_reports.*) in a process pool.
+
+    At most `concurrency` renders run at once; the rest wait in line, and the
+    queue depth is tracked so it can be monitored. With workers=0, or where
+    fork is unavailable, renders fall back to a worker thread.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, concurrency=RENDER_CONCURRENCY):
+        self.workers = workers
+        self.concurrency = concurrency
+        self._executor = None
+        self._semaphore = None
+
+        self.queued = 0
+        self.max_queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def start(self):
+        """Forks the worker processes. Call early, before the bot starts its own threads."""
+        if self._executor or self.workers <= 0:
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            logging.warning("⚠️ fork is unavailable, PDFs will be rendered in a thread instead.")
+            return
+
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+        # With fork all workers start on the first submit; do it now, while we are single-threaded.
+        # The warm-up imports then run in the workers without holding up the boot.
+        self._executor.submit(_warm_up)
+        logging.info(f"🖨 Render pool started with {self.workers} workers")
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, func, *args):
+        """Renders a report off the event loop and returns the PDF bytes."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        waiting = True
+        try:
+            async with self._semaphore:
+                waiting = False
+                self.queued -= 1
+                self.active += 1
+                started = time.monotonic()
+                try:
+                    if self._executor:
+                        loop = asyncio.get_running_loop()
+                        result = await loop.run_in_executor(self._executor, func, *args)
+                    else:
+                        result = await asyncio.to_thread(func, *args)
+                    self.completed += 1
+                    return result
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.active -= 1
+                    seconds = time.monotonic() - started
+                    self.total_seconds += seconds
+                    RENDER_SECONDS.observe(seconds, report=func.__name__)
+        finally:
+            if waiting:  # Cancelled while still in line
+                self.queued -= 1
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_seconds": round(self.total_seconds / self.completed, 3) if self.completed else 0.0,
+        }
+
+
+render_service = RenderService()
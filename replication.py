@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import zlib
+
+from config import REPLICA_SNAPSHOT_EVERY
+
+# Objects on Drive are named "<db name>.snapshot.<seq>" and "<db name>.segment.<seq>".
+# A restore takes the newest snapshot and replays every later segment in order.
+SEGMENT_MAGIC = b"BZSG"
+SEGMENT_HEADER = struct.Struct(">4sIII")  # magic, page size, page count after segment, changed pages
+PAGE_NUMBER = struct.Struct(">I")
+
+
+def read_page_size(path):
+    """Reads the page size from the SQLite file header."""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    page_size = struct.unpack(">H", header[16:18])[0]
+    return 65536 if page_size == 1 else page_size
+
+
+def iter_pages(path, page_size):
+    """Yields the raw pages of a database file."""
+    with open(path, "rb") as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def hash_page(page):
+    return hashlib.blake2b(page, digest_size=16).hexdigest()
+
+
+def object_name(db_name, kind, seq):
+    return f"{db_name}.{kind}.{seq:010d}"
+
+
+def parse_object_name(db_name, name):
+    """Returns (kind, seq) for a replica object name, or None for anything else."""
+    parts = name[len(db_name) + 1:].split(".")
+    if not name.startswith(db_name + ".") or len(parts) != 2 or parts[0] not in ("snapshot", "segment"):
+        return None
+    if not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1])
+
+
+class PageReplicator:
+    """Ships only the pages that changed since the last backup, Litestream-style.
+
+    Keeps a local manifest with a hash of every page as it exists on Drive.
+    Each ship() diffs a consistent snapshot against it and uploads the changed
+    pages as one small numbered segment. Every REPLICA_SNAPSHOT_EVERY segments
+    (or once segments outweigh the database) a full snapshot is written and
+    the segments before the previous snapshot are deleted.
+    """
+
+    def __init__(self, db_path, folder_id, snapshot_every=REPLICA_SNAPSHOT_EVERY):
+        self.db_path = db_path
+        self.folder_id = folder_id
+        self.snapshot_every = snapshot_every
+        self.db_name = os.path.basename(db_path)
+        self.manifest_path = f"{db_path}.replica.json"
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Ignoring unreadable replica manifest: {e}")
+            return None
+
+    def save_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def ship(self, drive, snapshot_path):
+        """Uploads the difference between `snapshot_path` and what Drive already has."""
+        page_size = read_page_size(snapshot_path)
+        hashes = []
+        changed = []
+        manifest = self.load_manifest()
+        old_hashes = manifest["hashes"] if manifest and manifest["page_size"] == page_size else None
+
+        for page_no, page in enumerate(iter_pages(snapshot_path, page_size)):
+            digest = hash_page(page)
+            hashes.append(digest)
+            if old_hashes is not None and (page_no >= len(old_hashes) or old_hashes[page_no] != digest):
+                changed.append((page_no, page))
+
+        db_bytes = len(hashes) * page_size
+        needs_snapshot = (
+            old_hashes is None
+            or manifest["segments_since_snapshot"] >= self.snapshot_every
+            or manifest["segment_bytes"] + len(changed) * page_size > db_bytes
+        )
+
+        if not needs_snapshot and not changed and len(hashes) == len(old_hashes):
+            logging.info("✅ Replica already up to date, nothing to ship.")
+            return True
+
+        seq = manifest["seq"] + 1 if manifest else self.latest_seq(drive) + 1
+        if needs_snapshot:
+            with open(snapshot_path, "rb") as f:
+                payload = zlib.compress(f.read())
+            drive.upload_bytes(payload, object_name(self.db_name, "snapshot", seq), self.folder_id)
+            logging.info(f"📸 Shipped full snapshot #{seq} ({len(payload)} bytes)")
+            previous_snapshot = manifest["snapshot_seq"] if manifest else None
+            manifest = {
+                "seq": seq,
+                "snapshot_seq": seq,
+                "previous_snapshot_seq": previous_snapshot,
+                "segments_since_snapshot": 0,
+                "segment_bytes": 0,
+                "page_size": page_size,
+                "hashes": hashes,
+            }
+            self.save_manifest(manifest)
+            if previous_snapshot:
+                self.compact(drive, keep_from=previous_snapshot)
+            return True
+
+        body = [SEGMENT_HEADER.pack(SEGMENT_MAGIC, page_size, len(hashes), len(changed))]
+        for page_no, page in changed:
+            body.append(PAGE_NUMBER.pack(page_no))
+            body.append(page)
+        payload = zlib.compress(b"".join(body))
+        drive.upload_bytes(payload, object_name(self.db_name, "segment", seq), self.folder_id)
+        logging.info(f"🧩 Shipped segment #{seq}: {len(changed)} changed pages ({len(payload)} bytes)")
+
+        manifest.update(
+            seq=seq,
+            segments_since_snapshot=manifest["segments_since_snapshot"] + 1,
+            segment_bytes=manifest["segment_bytes"] + len(changed) * page_size,
+            hashes=hashes,
+        )
+        self.save_manifest(manifest)
+        return True
+
+    def latest_seq(self, drive):
+        """Highest object number already on Drive, so a fresh manifest never reuses a name."""
+        seqs = [parsed[1] for parsed in (
+            parse_object_name(self.db_name, name) for name, _ in drive.list_files(f"{self.db_name}.", self.folder_id)
+        ) if parsed]
+        return max(seqs, default=0)
+
+    def compact(self, drive, keep_from):
+        """Deletes replica objects older than the snapshot numbered `keep_from`."""
+        removed = 0
+        for name, file_id in drive.list_files(f"{self.db_name}.", self.folder_id):
+            parsed = parse_object_name(self.db_name, name)
+            if parsed and parsed[1] < keep_from:
+                try:
+                    drive.delete_file(file_id)
+                    removed += 1
+                except Exception as e:
+                    logging.warning(f"⚠️ Failed to delete old replica object {name}: {e}")
+        if removed:
+            logging.info(f"🧹 Compacted replica: removed {removed} old objects")
+
+
+def apply_segment(db_file, payload):
+    """Writes a segment's pages into an open database file and truncates it to the new size."""
+    data = zlib.decompress(payload)
+    magic, page_size, page_count, changed = SEGMENT_HEADER.unpack_from(data, 0)
+    if magic != SEGMENT_MAGIC:
+        raise ValueError("not a replica segment")
+
+    offset = SEGMENT_HEADER.size
+    for _ in range(changed):
+        (page_no,) = PAGE_NUMBER.unpack_from(data, offset)
+        offset += PAGE_NUMBER.size
+        db_file.seek(page_no * page_size)
+        db_file.write(data[offset:offset + page_size])
+        offset += page_size
+    db_file.truncate(page_count * page_size)
+
+
+def restore_replica(drive, db_path, folder_id):
+    """Rebuilds the database from the newest snapshot plus later segments.
+
+    Returns False when the folder holds no replica, so the caller can fall
+    back to the whole-file backup.
+    """
+    from gdrive import remove_stale_wal  # Import here to avoid circular dependency
+
+    db_name = os.path.basename(db_path)
+    objects = {}
+    for name, file_id in drive.list_files(f"{db_name}.", folder_id):
+        parsed = parse_object_name(db_name, name)
+        if parsed:
+            objects[parsed[1]] = (parsed[0], file_id)
+
+    snapshots = [seq for seq, (kind, _) in objects.items() if kind == "snapshot"]
+    if not snapshots:
+        return False
+
+    snapshot_seq = max(snapshots)
+    tmp_path = f"{db_path}.restore"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.decompress(drive.download_bytes(objects[snapshot_seq][1])))
+
+    seq = snapshot_seq
+    with open(tmp_path, "r+b") as f:
+        while (seq + 1) in objects and objects[seq + 1][0] == "segment":
+            apply_segment(f, drive.download_bytes(objects[seq + 1][1]))
+            seq += 1
+
+    later = [s for s in objects if s > seq]
+    if later:
+        logging.warning(f"⚠️ Replica has a gap after #{seq}; ignoring {len(later)} later objects.")
+
+    remove_stale_wal(db_path)
+    os.replace(tmp_path, db_path)
+
+    # Seed the manifest so the next ship() continues the chain instead of re-uploading everything
+    replicator = PageReplicator(db_path, folder_id)
+    page_size = read_page_size(db_path)
+    replicator.save_manifest({
+        "seq": max(objects),
+        "snapshot_seq": snapshot_seq,
+        "previous_snapshot_seq": None,
+        # After a gap the chain is broken, so force a fresh snapshot on the next ship
+        "segments_since_snapshot": replicator.snapshot_every if later else seq - snapshot_seq,
+        "segment_bytes": 0,
+        "page_size": page_size,
+        "hashes": [hash_page(page) for page in iter_pages(db_path, page_size)],
+    })
+    logging.info(f"✅ Database restored from replica (snapshot #{snapshot_seq} + {seq - snapshot_seq} segments)")
+    return True
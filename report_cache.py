@@ -0,0 +1,77 @@
+import logging
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+
+from config import REPORT_CACHE_SIZE
+
+
+class ReportCache:
+    """Remembers the Telegram file_ids of each generated report, per data version.
+
+    A report is identified by a name ("employee_list", "order_details:42") and
+    the change counters of the tables it reads (database.get_table_versions).
+    A report may span several documents (see handlers/list_users.py). While
+    the counters are unchanged the report is resent by file_id: no query, no
+    render, no upload. Bounded LRU; only used from the event loop.
+    """
+
+    def __init__(self, maxsize=REPORT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # report -> (version, ((file_id, caption), ...))
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, report, version):
+        """Returns the (file_id, caption) pairs of the report at this version, or None."""
+        entry = self._data.get(report)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._data.move_to_end(report)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, report, version, documents):
+        self._data[report] = (version, tuple(documents))
+        self._data.move_to_end(report)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def forget(self, report):
+        self._data.pop(report, None)
+
+    async def resend(self, report, version, send_document, **kwargs):
+        """Sends the cached copy with send_document (e.g. message.answer_document). Returns False on a miss."""
+        documents = self.get(report, version)
+        if documents is None:
+            return False
+        try:
+            for file_id, caption in documents:
+                await send_document(file_id, caption=caption, **kwargs)
+            return True
+        except TelegramBadRequest as e:
+            logging.warning(f"⚠️ Cached report {report} could not be resent, regenerating: {e}")
+            self.forget(report)
+            return False
+
+    def remember(self, report, version, *sent_messages):
+        """Stores the file_ids Telegram assigned to the documents of a freshly uploaded report."""
+        if sent_messages and all(sent and sent.document for sent in sent_messages):
+            self.put(report, version, [(sent.document.file_id, sent.caption) for sent in sent_messages])
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+report_cache = ReportCache()
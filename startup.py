@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+
+
+class StartupPipeline:
+    """Boot sequence of the bot, timed phase by phase.
+
+    The health server comes up first; the slow phases (database restore,
+    migrations, ...) then run with a timeout each. /ready answers 503 until
+    the dispatcher has started, then 200, and both include the time each
+    phase took, which is also logged once the bot is ready.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()  # Import of this module ≈ start of the process
+        self.phases = []  # [(name, seconds, outcome)]
+        self.current = None
+        self.ready = False
+        self.ready_after = None
+
+    def record(self, name, seconds, outcome="ok"):
+        self.phases.append((name, round(seconds, 3), outcome))
+
+    async def run(self, name, func, *args, timeout=None, in_thread=True):
+        """Runs one phase and records how long it took.
+
+        `func` is a coroutine function, a blocking function (run in a worker
+        thread), or with in_thread=False a quick function run inline. A phase
+        that fails or exceeds `timeout` seconds stops the startup.
+        """
+        self.current = name
+        started = time.monotonic()
+        try:
+            if asyncio.iscoroutinefunction(func):
+                result = await asyncio.wait_for(func(*args), timeout)
+            elif in_thread:
+                result = await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+            else:
+                result = func(*args)
+        except asyncio.TimeoutError:
+            self.record(name, time.monotonic() - started, "timeout")
+            raise RuntimeError(f"Startup phase '{name}' did not finish within {timeout} s") from None
+        except Exception:
+            self.record(name, time.monotonic() - started, "failed")
+            raise
+        finally:
+            self.current = None
+        self.record(name, time.monotonic() - started)
+        return result
+
+    async def mark_ready(self, **kwargs):
+        """Dispatcher startup hook (registered last): the bot now handles updates."""
+        self.ready = True
+        self.ready_after = round(time.monotonic() - self.started, 3)
+        logging.info(self.report())
+
+    def report(self):
+        lines = [f"⏱ Startup took {self.ready_after or round(time.monotonic() - self.started, 3)} s"]
+        for name, seconds, outcome in self.phases:
+            lines.append(f"   {name:<16} {seconds:>8.3f} s{'' if outcome == 'ok' else f'  ({outcome})'}")
+        return "\n".join(lines)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "ready_after": self.ready_after,
+            "current_phase": self.current,
+            "phases": [{"name": name, "seconds": seconds, "outcome": outcome} for name, seconds, outcome in self.phases],
+        }
+
+    async def handle_ready(self, request):
+        """GET /ready: 503 while starting, 200 once updates are handled."""
+        from aiohttp import web  # Keeps this module light: it is imported first to time the boot
+
+        return web.json_response(self.stats(), status=200 if self.ready else 503)
+
+
+startup = StartupPipeline()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONCURRENCY
+from startup import startup
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """aiogram webhook handler that processes at most `max_concurrency` updates at once.
+
+    Updates are acknowledged as soon as a slot is free and handled in the
+    background. When every slot is busy the HTTP request waits, which makes
+    Telegram slow down instead of the bot piling up tasks.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrency=WEBHOOK_MAX_CONCURRENCY, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+        self.received = 0
+        self.unauthorized = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failed = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not startup.ready:
+            # A webhook left over from the previous run can deliver before the database is restored; Telegram retries
+            return web.Response(status=503, text="Starting")
+        response = await super().handle(request)
+        if response.status == 401:
+            self.unauthorized += 1
+            logging.warning(f"⚠️ Rejected webhook call with a wrong secret from {request.remote}")
+        return response
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        self.received += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        task = asyncio.create_task(self._process(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _process(self, bot: Bot, update: Dict[str, Any]):
+        try:
+            await self._background_feed_update(bot, update)
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"❌ Failed to process webhook update: {e}")
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Waits for updates still being processed. The bot session is closed by bot.py."""
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "unauthorized": self.unauthorized,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "failed": self.failed,
+        }
+
+
+def mount_webhook(app: web.Application, dispatcher: Dispatcher, bot: Bot):
+    """Registers the update route on `app` (before the server starts). Returns the handler."""
+    handler = BoundedRequestHandler(dispatcher, bot, secret_token=WEBHOOK_SECRET)
+    handler.register(app, path=WEBHOOK_PATH)
+    return handler
+
+
+async def set_webhook(dispatcher: Dispatcher, bot: Bot):
+    """Points Telegram at our webhook route. Returns False if Telegram refused, so we can poll instead."""
+    url = WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH
+    try:
+        await bot.set_webhook(
+            url=url,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONCURRENCY,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+    except Exception as e:
+        logging.error(f"❌ Could not set webhook to {url}: {e}")
+        return False
+    logging.info(f"🔗 Webhook set to {url}")
+    return True